@@ -0,0 +1,252 @@
+"""
+Índice de consulta en memoria sobre standard/dim_book.parquet.
+Resuelve el libro canónico por isbn13, isbn10, book_id, gb_id o prefijo de título normalizado,
+con consultas puntuales y por lotes, y se recarga solo cuando se publica un Parquet nuevo.
+Acepta también la exportación Arrow IPC (dim_book.arrow), que se abre con memory-map.
+Opcionalmente se sirve por HTTP local: python src/book_lookup.py --port 8765
+"""
+import os
+import sys
+import json
+import time
+import bisect
+import logging
+import argparse
+import threading
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT_DIR / "src"))
+
+from utils_isbn import normalize_isbn
+from utils_arrow import read_table
+
+STANDARD_DIR = ROOT_DIR / "standard"
+DIM_BOOK_PATH = STANDARD_DIR / "dim_book.parquet"
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+KEY_FIELDS = ["isbn13", "isbn10", "book_id", "gb_id"]
+ISBN_FIELDS = {"isbn13", "isbn10"}
+# Cada cuánto se comprueba (como mucho) si el Parquet ha cambiado
+RELOAD_CHECK_S = 1.0
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+SEARCH_LIMIT = 10
+
+
+def normalize_title(title):
+    """Título en minúsculas y con los espacios colapsados."""
+    if title is None:
+        return ""
+    return " ".join(str(title).lower().split())
+
+
+def _normalize_key(field, value):
+    if value is None:
+        return None
+    if field in ISBN_FIELDS:
+        return normalize_isbn(value)
+    s = str(value).strip()
+    return s or None
+
+
+class BookIndex:
+    """
+    Índices dict por clave y lista ordenada de títulos para búsquedas por prefijo.
+    Las recargas construyen un estado nuevo y lo sustituyen de una vez, así que
+    las consultas concurrentes nunca ven un índice a medio construir.
+    """
+
+    def __init__(self, path=DIM_BOOK_PATH, reload_check_s=RELOAD_CHECK_S):
+        self.path = Path(path)
+        self.reload_check_s = reload_check_s
+        self._lock = threading.Lock()
+        self._next_check = 0.0
+        self._state = None
+        self.reload()
+
+    # --- Carga ---
+
+    def _file_version(self):
+        st = os.stat(self.path)
+        return st.st_mtime_ns, st.st_size
+
+    def reload(self):
+        """Lee la tabla (Parquet o Arrow IPC) y reconstruye todos los índices."""
+        version = self._file_version()
+        rows = read_table(self.path).to_pylist()
+
+        keys = {field: {} for field in KEY_FIELDS}
+        titles = []
+        for i, row in enumerate(rows):
+            for field in KEY_FIELDS:
+                key = _normalize_key(field, row.get(field))
+                if key is not None:
+                    keys[field].setdefault(key, i)
+            title = normalize_title(row.get("title"))
+            if title:
+                titles.append((title, i))
+        titles.sort()
+
+        self._state = {
+            "version": version,
+            "rows": rows,
+            "keys": keys,
+            "title_keys": [t for t, _ in titles],
+            "title_rows": [i for _, i in titles],
+            "loaded_at": time.time(),
+        }
+        self._next_check = time.monotonic() + self.reload_check_s
+        logging.info(f"Índice cargado desde {self.path} ({len(rows)} libros)")
+
+    def _current(self):
+        """Estado vigente; recarga si el archivo publicado ha cambiado desde la última lectura."""
+        if time.monotonic() >= self._next_check and self._lock.acquire(blocking=False):
+            try:
+                self._next_check = time.monotonic() + self.reload_check_s
+                try:
+                    if self._file_version() != self._state["version"]:
+                        self.reload()
+                except FileNotFoundError:
+                    # Publicación en curso (renombrado); se sigue sirviendo el índice anterior
+                    pass
+                except Exception as e:
+                    # Archivo a medio escribir: se reintenta en la siguiente comprobación
+                    logging.warning(f"No se pudo recargar {self.path}: {type(e).__name__}: {e}")
+            finally:
+                self._lock.release()
+        return self._state
+
+    # --- Consultas ---
+
+    def get(self, value, field="isbn13"):
+        """Libro cuyo `field` coincide exactamente con `value`, o None."""
+        if field not in KEY_FIELDS:
+            raise ValueError(f"Campo no indexado: {field}. Usa uno de {KEY_FIELDS}")
+        state = self._current()
+        i = state["keys"][field].get(_normalize_key(field, value))
+        return None if i is None else state["rows"][i]
+
+    def get_many(self, values, field="isbn13"):
+        """Consulta por lotes: una lista con el libro (o None) para cada valor, en el mismo orden."""
+        if field not in KEY_FIELDS:
+            raise ValueError(f"Campo no indexado: {field}. Usa uno de {KEY_FIELDS}")
+        state = self._current()
+        index, rows = state["keys"][field], state["rows"]
+        positions = (index.get(_normalize_key(field, v)) for v in values)
+        return [None if i is None else rows[i] for i in positions]
+
+    def search_title(self, prefix, limit=SEARCH_LIMIT):
+        """Libros cuyo título normalizado empieza por `prefix`, en orden alfabético."""
+        prefix = normalize_title(prefix)
+        if not prefix:
+            return []
+        state = self._current()
+        title_keys, title_rows, rows = state["title_keys"], state["title_rows"], state["rows"]
+        start = bisect.bisect_left(title_keys, prefix)
+        results = []
+        for j in range(start, len(title_keys)):
+            if len(results) >= limit or not title_keys[j].startswith(prefix):
+                break
+            results.append(rows[title_rows[j]])
+        return results
+
+    def find(self, query):
+        """Libro canónico para un ISBN, book_id, gb_id o título: prueba las claves y luego el título."""
+        for field in KEY_FIELDS:
+            book = self.get(query, field)
+            if book is not None:
+                return book
+        matches = self.search_title(query, limit=1)
+        return matches[0] if matches else None
+
+    def stats(self):
+        state = self._current()
+        return {
+            "path": str(self.path),
+            "rows": len(state["rows"]),
+            "loaded_at": state["loaded_at"],
+            "keys": {field: len(idx) for field, idx in state["keys"].items()},
+        }
+
+
+# --- Servicio HTTP local ---
+
+def make_handler(index):
+    class LookupHandler(BaseHTTPRequestHandler):
+        """
+        GET  /book?isbn13=...  (o isbn10, book_id, gb_id, q)
+        GET  /search?title=prefijo&limit=10
+        POST /books  {"field": "isbn13", "keys": [...]}
+        GET  /health
+        """
+
+        def _send(self, status, payload):
+            body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            params = {k: v[0] for k, v in parse_qs(url.query).items()}
+            if url.path == "/health":
+                return self._send(200, index.stats())
+            if url.path == "/book":
+                if "q" in params:
+                    book = index.find(params["q"])
+                else:
+                    field = next((f for f in KEY_FIELDS if f in params), None)
+                    if field is None:
+                        return self._send(400, {"error": f"Indica q o uno de {KEY_FIELDS}"})
+                    book = index.get(params[field], field)
+                return self._send(200 if book else 404, {"book": book})
+            if url.path == "/search":
+                try:
+                    limit = int(params.get("limit", SEARCH_LIMIT))
+                except ValueError:
+                    return self._send(400, {"error": "limit debe ser un entero"})
+                return self._send(200, {"books": index.search_title(params.get("title", ""), limit)})
+            return self._send(404, {"error": f"Ruta desconocida: {url.path}"})
+
+        def do_POST(self):
+            if urlparse(self.path).path != "/books":
+                return self._send(404, {"error": f"Ruta desconocida: {self.path}"})
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                books = index.get_many(payload.get("keys", []), payload.get("field", "isbn13"))
+            except (ValueError, AttributeError) as e:
+                return self._send(400, {"error": str(e)})
+            return self._send(200, {"books": books})
+
+        def log_message(self, format, *args):
+            logging.debug(f"{self.address_string()} - {format % args}")
+
+    return LookupHandler
+
+
+def serve(path=DIM_BOOK_PATH, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    index = BookIndex(path)
+    server = ThreadingHTTPServer((host, port), make_handler(index))
+    logging.info(f"Servicio de consulta en http://{host}:{port} sobre {path}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servicio local de consulta de dim_book")
+    parser.add_argument("--path", type=Path, default=DIM_BOOK_PATH)
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+    serve(args.path, args.host, args.port)
@@ -0,0 +1,104 @@
+"""
+Caché de etapas del pipeline.
+Calcula una huella (sha256) de las entradas, el código y los parámetros de cada etapa y
+permite saltarla cuando ya existe una ejecución con la misma huella y todas sus salidas.
+"""
+import os
+import json
+import hashlib
+import logging
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+CACHE_DIR = ROOT_DIR / ".cache"
+BUILD_CACHE_PATH = CACHE_DIR / "build_cache.json"
+
+CHUNK_SIZE = 1 << 20
+
+
+def file_digest(path) -> str:
+    """sha256 del contenido del archivo, leído por bloques."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _rel(path) -> str:
+    path = Path(path)
+    try:
+        return str(path.resolve().relative_to(ROOT_DIR))
+    except ValueError:
+        return str(path)
+
+
+def stage_fingerprint(inputs, code, params) -> dict:
+    """
+    Huella de una etapa: digest de cada entrada y cada archivo de código más los parámetros.
+    Lanza FileNotFoundError si falta alguna entrada.
+    """
+    parts = {
+        "inputs": {_rel(p): file_digest(p) for p in inputs},
+        "code": {_rel(p): file_digest(p) for p in code},
+        "params": {k: str(v) for k, v in sorted(params.items())},
+    }
+    parts["fingerprint"] = hashlib.sha256(json.dumps(parts, sort_keys=True).encode("utf-8")).hexdigest()
+    return parts
+
+
+def load_cache() -> dict:
+    try:
+        with open(BUILD_CACHE_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _explain(previous, current, outputs):
+    """Motivos por los que la etapa debe ejecutarse (lista vacía = se puede saltar)."""
+    if not previous:
+        return ["no hay ejecución previa en caché"]
+    reasons = []
+    for section, label in (("inputs", "entrada"), ("code", "código")):
+        for name, digest in current[section].items():
+            if previous.get(section, {}).get(name) != digest:
+                reasons.append(f"cambió {label} {name}")
+    if previous.get("params") != current["params"]:
+        changed = sorted(
+            k for k in set(current["params"]) | set(previous.get("params", {}))
+            if current["params"].get(k) != previous.get("params", {}).get(k)
+        )
+        reasons.append(f"cambiaron parámetros: {', '.join(changed)}")
+    if not reasons and previous.get("fingerprint") != current["fingerprint"]:
+        reasons.append("cambió la huella de la etapa")
+    missing = [_rel(p) for p in outputs if not Path(p).exists()]
+    if missing:
+        reasons.append(f"faltan salidas: {', '.join(missing)}")
+    return reasons
+
+
+def check_stage(stage, inputs, code, params, outputs, force=False):
+    """
+    Decide si la etapa debe ejecutarse.
+    Devuelve (ejecutar, motivo, huella); la huella se pasa luego a record_stage().
+    """
+    current = stage_fingerprint(inputs, code, params)
+    if force:
+        return True, "--force", current
+    reasons = _explain(load_cache().get(stage), current, outputs)
+    if reasons:
+        return True, "; ".join(reasons), current
+    return False, f"entradas, código y parámetros sin cambios (huella {current['fingerprint'][:12]})", current
+
+
+def record_stage(stage, fingerprint, outputs):
+    """Guarda la huella de una ejecución completada con éxito."""
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    cache = load_cache()
+    cache[stage] = dict(fingerprint, outputs=[_rel(p) for p in outputs])
+    tmp = BUILD_CACHE_PATH.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(cache, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, BUILD_CACHE_PATH)
+    logging.info(f"Caché actualizada para la etapa '{stage}'")
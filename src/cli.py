@@ -0,0 +1,388 @@
+"""
+CLI unificada del pipeline: python src/cli.py <subcomando> [opciones]
+Cada subcomando importa su módulo solo al ejecutarse, así que arrancar la CLI
+no paga el coste de pandas, pyarrow ni selenium.
+"""
+import sys
+import random
+import argparse
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+SRC_DIR = ROOT_DIR / "src"
+sys.path.insert(0, str(SRC_DIR))
+
+# Presupuesto de arranque en frío de la CLI (`cli.py --help`), en milisegundos
+STARTUP_BUDGET_MS = 250
+# Módulos que no deben cargarse al importar la CLI ni los helpers ligeros
+HEAVY_MODULES = ["pandas", "numpy", "pyarrow", "selenium", "webdriver_manager"]
+# Import ligero -> módulos pesados que sí puede cargar (los lectores Arrow necesitan pyarrow, no pandas)
+ARROW_ONLY = ("pyarrow", "numpy")
+LIGHT_IMPORTS = {
+    "cli": (), "utils_isbn": (), "build_cache": (), "enrich_providers": (), "enrich_googlebooks": (),
+    "googlebooks_stub": (), "scrape_goodreads": (), "utils_arrow": ARROW_ONLY, "book_lookup": ARROW_ONLY,
+}
+# Pico fijado para la integración sin copias sobre la entrada sintética de referencia
+MEMORY_CHECK_BOOKS = 1000
+MEMORY_CHECK_BUDGET_MB = 6
+# Proveedores simulados del check de enriquecimiento (latencia en segundos)
+PROVIDERS_CHECK_FAST_S = 0.05
+PROVIDERS_CHECK_SLOW_S = 0.4
+# Caso de cola: muchos libros, un proveedor rápido que responde a todos y uno lento que nunca hace falta
+PROVIDERS_BACKLOG_BOOKS = 200
+PROVIDERS_BACKLOG_FAST_S = 0.01
+PROVIDERS_BACKLOG_SLOW_S = 0.3
+# Tiempo total admitido con el lento respecto a solo el rápido
+PROVIDERS_BACKLOG_RATIO = 1.25
+
+
+def _given(args, *names):
+    """Opciones indicadas en la línea de comandos; el resto usa los valores por defecto del módulo."""
+    return {name: getattr(args, name) for name in names if getattr(args, name) is not None}
+
+
+def cmd_scrape(args):
+    from scrape_goodreads import iter_goodreads_books, save_goodreads_books
+    save_goodreads_books(list(iter_goodreads_books(**_given(args, "search_term", "target_count"))))
+
+
+def cmd_enrich(args):
+    from enrich_googlebooks import enrich_books
+    enrich_books(force=args.force, **_given(args, "sink", "batch_size", "mode"))
+
+
+def cmd_integrate(args):
+    from integrate_pipeline import integrate_pipeline
+    integrate_pipeline(force=args.force, arrow_ipc=args.arrow_ipc, memory_budget_mb=args.memory_budget_mb)
+
+
+def cmd_run(args):
+    from run_pipeline import run_pipeline
+    run_pipeline(arrow_ipc=args.arrow_ipc,
+                 **_given(args, "search_term", "target_count", "enrich_workers", "queue_size", "batch_size"))
+
+
+def cmd_bench_parser(args):
+    import json
+    from parse_goodreads import benchmark, build_fixture_page, load_fixture_books
+
+    source = args.html.read_text(encoding="utf-8") if args.html else build_fixture_page(load_fixture_books())
+    print(json.dumps(benchmark(source, repeat=args.repeat, pages=args.pages), indent=2))
+
+
+def cmd_serve(args):
+    from book_lookup import serve
+    serve(**_given(args, "path", "host", "port"))
+
+
+def cmd_compact(args):
+    from detail_history import compact
+    compact(**_given(args, "root", "min_files"))
+
+
+def synthetic_sources(n_books=2000, seed=0):
+    """
+    Entradas sintéticas deterministas con la forma de landing/: libros de Goodreads sin ISBN
+    y ~80% encontrados en Google Books (unidos por join_key), con autores y categorías repetidos.
+    Sirven para medir memoria y rendimiento de la integración sin depender de los archivos reales.
+    """
+    from integrate_pipeline import goodreads_frame, google_frame
+    from utils_isbn import complete_isbn13
+
+    rng = random.Random(seed)
+    authors = [f"Author {i}" for i in range(max(1, n_books // 5))]
+    categories = ["Computers", "Science", "Mathematics", "Business & Economics", "Psychology"]
+    gr_records, gb_records = [], []
+    for i in range(n_books):
+        title = f"Synthetic Book {i}: Data Science Volume {i % 97}"
+        book_authors = rng.sample(authors, k=min(len(authors), rng.randint(1, 3)))
+        gr_records.append({
+            "title": title, "author": book_authors[0], "rating": round(rng.uniform(2.5, 5.0), 2),
+            "ratings_count": rng.randint(0, 50000), "book_url": f"https://www.goodreads.com/book/show/{i}",
+            "isbn10": None, "isbn13": None,
+        })
+        if rng.random() < 0.8:
+            gb_records.append({
+                "gb_id": f"gb{i:08d}", "title": title, "subtitle": None, "authors": book_authors,
+                "publisher": f"Publisher {i % 50}", "pub_date": f"{2000 + i % 25}-0{1 + i % 9}",
+                "language": rng.choice(["en", "es", "en-GB"]), "categories": rng.sample(categories, k=2),
+                "isbn13": complete_isbn13(f"978{i:09d}"), "isbn10": None,
+                "price_amount": round(rng.uniform(5, 80), 2) if rng.random() < 0.5 else None,
+                "price_currency": rng.choice(["EUR", "USD"]),
+                "goodreads_title_query": title, "goodreads_author_query": book_authors[0],
+            })
+    return goodreads_frame(gr_records), google_frame(gb_records)
+
+
+def cmd_check_memory(args):
+    """Falla (código 1) si la integración de la entrada sintética supera el pico de memoria fijado."""
+    from integrate_pipeline import transform_sources
+    from utils_memory import MemoryBudgetError
+
+    df_gr, df_gb = synthetic_sources(args.books)
+    report = {}
+    try:
+        transform_sources(df_gr, df_gb, memory_budget_mb=args.budget_mb, memory_report=report)
+    except MemoryBudgetError as e:
+        print(f"Picos por etapa (MB): {report}")
+        print(f"FALLO: {e}")
+        sys.exit(1)
+    print(f"Picos por etapa (MB): {report} (presupuesto {args.budget_mb} MB, {args.books} libros)")
+    print("OK")
+
+
+def _timed(fn, *args):
+    import time
+
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def cmd_check_providers(args):
+    """
+    Falla (código 1) si el motor de enriquecimiento no acota la latencia por el proveedor más
+    rápido que responde, no combina bien las respuestas o no reintenta los 429/5xx. Usa proveedores
+    locales simulados que pasan por el mismo lookup que los reales.
+    """
+    import time
+    import logging
+    from enrich_providers import EnrichmentEngine, StubProvider
+
+    # Los fallos del proveedor "roto" son esperados
+    logging.getLogger().setLevel(logging.ERROR)
+
+    books = [{"title": f"Book {i}", "author": f"Author {i}"} for i in range(args.books)]
+    # El rápido conoce la mitad de los libros y sin precio; el lento todos y con precio
+    fast = {b["title"]: {"title": b["title"], "isbn13": f"978{i:010d}", "price_amount": None}
+            for i, b in enumerate(books) if i % 2 == 0}
+    slow = {b["title"]: {"title": b["title"], "isbn13": f"978{i:010d}", "price_amount": 10.0 + i}
+            for i, b in enumerate(books)}
+    providers = [
+        StubProvider("rapido", fast, latency_s=PROVIDERS_CHECK_FAST_S),
+        StubProvider("lento", slow, latency_s=PROVIDERS_CHECK_SLOW_S),
+        StubProvider("roto", fail=True, latency_s=0.01),
+    ]
+
+    failures = []
+    for mode in ("first", "merge"):
+        with EnrichmentEngine(providers, mode) as engine:
+            for i, book in enumerate(books):
+                start = time.perf_counter()
+                record = engine.enrich(book)
+                elapsed = time.perf_counter() - start
+                known_fast = i % 2 == 0
+                bound = PROVIDERS_CHECK_FAST_S if (mode == "first" and known_fast) else PROVIDERS_CHECK_SLOW_S
+                if record is None or record["title"] != book["title"]:
+                    failures.append(f"{mode}: sin respuesta para {book['title']}")
+                elif elapsed > bound + args.slack_s:
+                    failures.append(f"{mode}: {book['title']} tardó {elapsed * 1000:.0f} ms (límite {bound * 1000:.0f} ms)")
+                elif mode == "merge" and record["price_amount"] is None:
+                    failures.append(f"merge: {book['title']} sin el precio del proveedor lento")
+            print(f"Modo {mode}: {engine.stats_summary()}")
+
+    # Un proveedor lento que nunca hace falta no debe retrasar al rápido en una tanda larga
+    backlog_books = [{"title": f"Backlog {i}"} for i in range(PROVIDERS_BACKLOG_BOOKS)]
+    answers = {b["title"]: {"title": b["title"], "isbn13": f"979{i:010d}"} for i, b in enumerate(backlog_books)}
+    totals = {}
+    for label, extra in (("solo rápido", []), ("rápido + lento", [StubProvider("lento", answers, latency_s=PROVIDERS_BACKLOG_SLOW_S)])):
+        with EnrichmentEngine([StubProvider("rapido", answers, latency_s=PROVIDERS_BACKLOG_FAST_S)] + extra) as engine:
+            start = time.perf_counter()
+            worst = max(_timed(engine.enrich, book) for book in backlog_books)
+            totals[label] = time.perf_counter() - start
+        print(f"Tanda de {len(backlog_books)} libros, {label}: {totals[label]:.2f} s (peor libro {worst * 1000:.0f} ms)")
+    limit = totals["solo rápido"] * PROVIDERS_BACKLOG_RATIO + args.slack_s
+    if totals["rápido + lento"] > limit:
+        failures.append(f"cola: con el proveedor lento la tanda tardó {totals['rápido + lento']:.2f} s "
+                        f"(límite {limit:.2f} s)")
+
+    # Reintentos por el lookup común: cada libro recibe 429 y 503 antes del 200
+    flaky = StubProvider("intermitente", slow, statuses=(429, 503))
+    for book in books:
+        if flaky.lookup(book) is None:
+            failures.append(f"reintentos: sin respuesta para {book['title']}")
+    print(f"Reintentos: {flaky.session.calls} peticiones para {len(books)} libros")
+    if flaky.session.calls != 3 * len(books):
+        failures.append(f"reintentos: {flaky.session.calls} peticiones, se esperaban {3 * len(books)}")
+
+    # Un Retry-After mayor que timeout_s no se espera: se abandona con el error en la primera respuesta
+    throttled = StubProvider("cuota", slow, statuses=(429,), retry_after_s=3600)
+    start = time.perf_counter()
+    try:
+        throttled.lookup(books[0])
+        failures.append("Retry-After: se devolvió respuesta en lugar del 429")
+    except Exception:
+        pass
+    elapsed = time.perf_counter() - start
+    print(f"Retry-After de 3600 s: abandonado en {elapsed * 1000:.0f} ms tras {throttled.session.calls} petición(es)")
+    if throttled.session.calls != 1 or elapsed > args.slack_s:
+        failures.append(f"Retry-After: {throttled.session.calls} peticiones en {elapsed * 1000:.0f} ms")
+
+    if failures:
+        print("FALLO: " + "; ".join(failures[:5]))
+        sys.exit(1)
+    print("OK")
+
+
+def cmd_stub_googlebooks(args):
+    from googlebooks_stub import config_from_args, serve
+    serve(config_from_args(args), **_given(args, "host", "port"))
+
+
+def cmd_loadtest_enrich(args):
+    """Enriquece libros sintéticos contra el stub local y muestra throughput, latencias y filas perdidas."""
+    import json
+    import logging
+    from googlebooks_stub import config_from_args, run_load_test
+
+    # Los 429/500 simulados y las búsquedas sin resultados son parte de la prueba
+    logging.getLogger().setLevel(logging.ERROR)
+    report = run_load_test(args.books, args.concurrency, config_from_args(args), args.api_url, args.max_retries)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.fail_on_lost and (report["filas_perdidas"] or report["filas_inesperadas"]):
+        print(f"FALLO: {report['filas_perdidas']} filas perdidas y {report['filas_inesperadas']} inesperadas")
+        sys.exit(1)
+
+
+def measure_startup(runs=5):
+    """Menor tiempo (ms) de `python src/cli.py --help` en procesos nuevos."""
+    import time
+    import subprocess
+
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, str(Path(__file__).resolve()), "--help"],
+                       check=True, stdout=subprocess.DEVNULL)
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def heavy_modules_loaded_by(module):
+    """Módulos pesados que arrastra importar `module` en un proceso nuevo."""
+    import subprocess
+
+    code = (
+        f"import sys; sys.path.insert(0, {str(SRC_DIR)!r}); import {module}; "
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    out = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True).stdout
+    return [m for m in out.strip().split(",") if m]
+
+
+def cmd_check_startup(args):
+    """Falla (código 1) si la CLI supera el presupuesto o algún import ligero carga módulos pesados."""
+    failures = []
+    elapsed = measure_startup(args.runs)
+    print(f"Arranque de la CLI: {elapsed:.0f} ms (presupuesto {args.budget_ms} ms)")
+    if elapsed > args.budget_ms:
+        failures.append(f"arranque {elapsed:.0f} ms > {args.budget_ms} ms")
+
+    for module, allowed in LIGHT_IMPORTS.items():
+        heavy = [m for m in heavy_modules_loaded_by(module) if m not in allowed]
+        print(f"import {module}: {', '.join(heavy) if heavy else 'sin módulos pesados'}"
+              + (f" (permitidos: {', '.join(allowed)})" if allowed else ""))
+        if heavy:
+            failures.append(f"import {module} carga {', '.join(heavy)}")
+
+    if failures:
+        print("FALLO: " + "; ".join(failures))
+        sys.exit(1)
+    print("OK")
+
+
+def build_parser():
+    # googlebooks_stub es un import ligero (solo biblioteca estándar): sus opciones se reutilizan tal cual
+    from googlebooks_stub import add_config_arguments
+
+    # Sin defaults aquí: leerlos de scrape_goodreads/run_pipeline haría que --help pagara sus imports
+    parser = argparse.ArgumentParser(prog="cli.py", description="Pipeline de libros Goodreads + Google Books")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("scrape", help="Bloque 1: scraping de Goodreads -> landing/goodreads_books.json")
+    p.add_argument("--query", dest="search_term")
+    p.add_argument("--target", dest="target_count", type=int)
+    p.set_defaults(func=cmd_scrape)
+
+    p = sub.add_parser("enrich", help="Bloque 2: Google Books -> landing/googlebooks_books.csv")
+    p.add_argument("--force", action="store_true", help="Ejecuta aunque la entrada no haya cambiado")
+    p.add_argument("--sink", choices=["csv", "parquet"], help="csv (landing, por defecto) o parquet por lotes")
+    p.add_argument("--batch-size", type=int, help="Filas por lote escrito")
+    p.add_argument("--mode", choices=["first", "merge"],
+                   help="Primera respuesta suficiente (por defecto) o combinación de todos los proveedores")
+    p.set_defaults(func=cmd_enrich)
+
+    p = sub.add_parser("integrate", help="Bloque 3: landing/ -> standard/ y docs/")
+    p.add_argument("--force", action="store_true", help="Regenera aunque las entradas no hayan cambiado")
+    p.add_argument("--arrow-ipc", action="store_true", help="Escribe también standard/*.arrow (Arrow IPC)")
+    p.add_argument("--memory-budget-mb", type=float,
+                   help="Modo sin copias: informa del pico por etapa y falla si se supera el presupuesto")
+    p.set_defaults(func=cmd_integrate)
+
+    p = sub.add_parser("run", help="Las tres etapas encadenadas con colas")
+    p.add_argument("--query", dest="search_term")
+    p.add_argument("--target", dest="target_count", type=int)
+    p.add_argument("--workers", dest="enrich_workers", type=int)
+    p.add_argument("--queue-size", type=int)
+    p.add_argument("--batch-size", type=int)
+    p.add_argument("--arrow-ipc", action="store_true", help="Escribe también standard/*.arrow (Arrow IPC)")
+    p.set_defaults(func=cmd_run)
+
+    p = sub.add_parser("bench-parser", help="Paridad y benchmark del parser de Goodreads")
+    p.add_argument("--html", type=Path)
+    p.add_argument("--repeat", type=int, default=50)
+    p.add_argument("--pages", type=int, default=64)
+    p.set_defaults(func=cmd_bench_parser)
+
+    p = sub.add_parser("serve", help="Servicio HTTP local de consulta sobre dim_book")
+    p.add_argument("--path", type=Path)
+    p.add_argument("--host")
+    p.add_argument("--port", type=int)
+    p.set_defaults(func=cmd_serve)
+
+    p = sub.add_parser("compact", help="Compacta el histórico standard/book_source_detail/")
+    p.add_argument("--root", type=Path)
+    p.add_argument("--min-files", type=int, help="Compacta solo particiones con al menos N archivos")
+    p.set_defaults(func=cmd_compact)
+
+    p = sub.add_parser("stub-googlebooks", help="Servidor local que imita la API de Google Books")
+    p.add_argument("--host")
+    p.add_argument("--port", type=int)
+    add_config_arguments(p)
+    p.set_defaults(func=cmd_stub_googlebooks)
+
+    p = sub.add_parser("loadtest-enrich", help="Banco de carga del enriquecimiento contra el stub local")
+    p.add_argument("--books", type=int, default=2000)
+    p.add_argument("--concurrency", type=int, default=16)
+    p.add_argument("--api-url", help="Endpoint de un stub ya arrancado (por defecto arranca uno en el proceso)")
+    p.add_argument("--max-retries", type=int, help="Reintentos ante 429/5xx (por defecto los del proveedor)")
+    p.add_argument("--fail-on-lost", action="store_true", help="Sale con código 1 si se pierde alguna fila o vuelve alguna inesperada")
+    add_config_arguments(p)
+    p.set_defaults(func=cmd_loadtest_enrich)
+
+    p = sub.add_parser("check-startup", help="Comprueba el presupuesto de arranque y los imports perezosos")
+    p.add_argument("--budget-ms", type=int, default=STARTUP_BUDGET_MS)
+    p.add_argument("--runs", type=int, default=5)
+    p.set_defaults(func=cmd_check_startup)
+
+    p = sub.add_parser("check-memory", help="Comprueba el pico de memoria de la integración con entrada sintética")
+    p.add_argument("--books", type=int, default=MEMORY_CHECK_BOOKS)
+    p.add_argument("--budget-mb", type=float, default=MEMORY_CHECK_BUDGET_MB)
+    p.set_defaults(func=cmd_check_memory)
+
+    p = sub.add_parser("check-providers", help="Comprueba el motor de enriquecimiento con proveedores simulados")
+    p.add_argument("--books", type=int, default=20)
+    p.add_argument("--slack-s", type=float, default=0.1, help="Margen sobre la latencia esperada")
+    p.set_defaults(func=cmd_check_providers)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+"""
+Bloque 3: Histórico append-only de book_source_detail
+Cada integración añade sus observaciones por fuente a standard/book_source_detail/,
+particionado por fecha de ingesta (ingestion_date=YYYY-MM-DD), sin reescribir lo anterior.
+Los registros que una ejecución ya no trae se marcan con una fila lápida (is_deleted), así que
+el lector as-of solo devuelve lo que estaba presente en la última ejecución hasta ese instante.
+La compactación une los archivos pequeños de cada partición y deja solo la última observación
+de cada registro de origen; dentro de un día compactado el as-of ve el estado del final del día.
+Compactar a mano: python src/detail_history.py --compact
+"""
+import os
+import sys
+import time
+import uuid
+import logging
+import argparse
+import subprocess
+from pathlib import Path
+from datetime import datetime, UTC
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT_DIR / "src"))
+
+from utils_arrow import encode_list_columns, table_from_frame, write_parquet_atomic
+
+DETAIL_HISTORY_DIR = ROOT_DIR / "standard" / "book_source_detail"
+COMPACTION_LOCK_NAME = ".compaction.lock"
+COMPACTION_LOG_PATH = ROOT_DIR / ".cache" / "compaction.log"
+
+PARTITION_PREFIX = "ingestion_date="
+# Instante de la observación: la ingesta más reciente de las dos fuentes de la fila
+OBSERVED_COL = "observed_at"
+# Un registro de origen es la fila de una fuente: (source_gb, gb_id) o (source_gr, gr_book_url)
+SOURCE_KEYS = [("source_gb", "gb_id"), ("source_gr", "gr_book_url")]
+# Fila lápida: el registro dejó de llegar en esa ejecución
+DELETED_COL = "is_deleted"
+# Relecturas si una compactación borra archivos ya listados
+READ_ATTEMPTS = 3
+# Archivos por partición a partir de los cuales merece la pena compactar
+COMPACT_MIN_FILES = 4
+# Un lock más antiguo que esto se considera de una compactación que murió
+LOCK_STALE_S = 3600
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+
+def _stamp():
+    return datetime.now(UTC).strftime("%Y%m%dT%H%M%S%fZ")
+
+
+def partitions(root=DETAIL_HISTORY_DIR):
+    """Directorios de partición ordenados por fecha: [(YYYY-MM-DD, ruta), ...]."""
+    root = Path(root)
+    if not root.exists():
+        return []
+    found = [(p.name[len(PARTITION_PREFIX):], p) for p in root.iterdir()
+             if p.is_dir() and p.name.startswith(PARTITION_PREFIX)]
+    return sorted(found)
+
+
+def _part_files(part_dir):
+    return sorted(Path(part_dir).glob("*.parquet"))
+
+
+def observed_at(df_detail: pd.DataFrame) -> pd.Series:
+    """Instante de cada fila: la mayor de ingestion_ts_gr e ingestion_ts_gb."""
+    ts = [pd.to_datetime(df_detail[c], utc=True, format="ISO8601", errors="coerce")
+          for c in ("ingestion_ts_gr", "ingestion_ts_gb") if c in df_detail.columns]
+    if not ts:
+        return pd.Series(pd.Timestamp.now(tz="UTC"), index=df_detail.index)
+    return pd.concat(ts, axis=1).max(axis=1).fillna(pd.Timestamp.now(tz="UTC"))
+
+
+def _key_columns():
+    return [c for pair in SOURCE_KEYS for c in pair]
+
+
+def record_key(table: pa.Table) -> pa.Array:
+    """
+    Identidad de cada fila como texto "fuente|id" por cada fuente presente en la fila.
+    Las filas de Goodreads traen también el gb_id del libro unido; solo cuenta el id de su fuente.
+    """
+    parts = []
+    for source_col, id_col in SOURCE_KEYS:
+        if source_col not in table.column_names:
+            continue
+        source = pc.cast(table[source_col], pa.string())
+        present = pc.is_valid(source)
+        ids = pc.cast(table[id_col], pa.string()) if id_col in table.column_names else pa.nulls(table.num_rows, pa.string())
+        parts += [pc.fill_null(source, ""), pc.if_else(present, pc.fill_null(ids, ""), "")]
+    if not parts:
+        return pa.array([""] * table.num_rows)
+    return pc.binary_join_element_wise(*parts, "|")
+
+
+def append_detail(df_detail: pd.DataFrame, root=DETAIL_HISTORY_DIR):
+    """
+    Añade las filas como archivos nuevos, uno por partición de fecha, sin tocar los existentes,
+    y una lápida por cada registro vigente que esta ejecución ya no trae.
+    Devuelve las rutas escritas.
+    """
+    root = Path(root)
+    previous = _as_of_table(None, root, columns=_key_columns() + ["book_id"])
+    df = df_detail.assign(**{OBSERVED_COL: observed_at(df_detail), DELETED_COL: False})
+    dates = df[OBSERVED_COL].dt.strftime("%Y-%m-%d")
+    name = f"part-{_stamp()}-{uuid.uuid4().hex[:8]}.parquet"
+
+    written = []
+    current = None
+    for date, rows in df.groupby(dates, sort=True):
+        part_dir = root / f"{PARTITION_PREFIX}{date}"
+        part_dir.mkdir(parents=True, exist_ok=True)
+        path = part_dir / name
+        table = table_from_frame(rows)
+        write_parquet_atomic(table, path)
+        current = table if current is None else pa.concat_tables([current, table], promote_options="permissive")
+        written.append(path)
+        logging.info(f"Añadido {path} ({len(rows)} filas)")
+
+    if previous is not None and previous.num_rows:
+        seen = record_key(current) if current is not None else pa.array([], pa.string())
+        gone = previous.filter(pc.invert(pc.is_in(record_key(previous), value_set=seen)))
+        if gone.num_rows:
+            path = write_tombstones(gone, root)
+            written.append(path)
+            logging.info(f"Añadido {path} ({gone.num_rows} registros que ya no llegan)")
+    return written
+
+
+def write_tombstones(gone: pa.Table, root=DETAIL_HISTORY_DIR):
+    """Escribe una fila lápida (solo la clave, observed_at=ahora e is_deleted) por registro desaparecido."""
+    now = datetime.now(UTC)
+    keep = [c for c in _key_columns() + ["book_id"] if c in gone.column_names]
+    table = gone.select(keep)
+    table = table.append_column(OBSERVED_COL, pa.array([now] * gone.num_rows, pa.timestamp("ns", tz="UTC")))
+    table = table.append_column(DELETED_COL, pa.array([True] * gone.num_rows, pa.bool_()))
+    part_dir = Path(root) / f"{PARTITION_PREFIX}{now.strftime('%Y-%m-%d')}"
+    part_dir.mkdir(parents=True, exist_ok=True)
+    path = part_dir / f"deleted-{_stamp()}-{uuid.uuid4().hex[:8]}.parquet"
+    write_parquet_atomic(table, path)
+    return path
+
+
+def _read_file(path, columns=None):
+    if columns is not None:
+        names = set(pq.read_schema(path).names)
+        columns = [c for c in columns if c in names]
+    return encode_list_columns(pq.read_table(path, columns=columns))
+
+
+def read_files(files, columns=None) -> pa.Table | None:
+    """
+    Une varios archivos aunque sus esquemas difieran (columnas nuevas, antes todo nulas o listas sin diccionario).
+    Con `columns` lee solo esas columnas de las que tenga cada archivo.
+    """
+    tables = [_read_file(f, columns) for f in files]
+    if not tables:
+        return None
+    return pa.concat_tables(tables, promote_options="permissive")
+
+
+def latest_per_record(table: pa.Table) -> pa.Table:
+    """Se queda con la última observación (fila o lápida) de cada registro de origen (SOURCE_KEYS)."""
+    # Solo se pasan a pandas la clave y el instante; el resto de columnas se seleccionan con take
+    small = pd.DataFrame({"key": record_key(table).to_numpy(zero_copy_only=False),
+                          OBSERVED_COL: table[OBSERVED_COL].to_pandas()})
+    small = small.sort_values(OBSERVED_COL, kind="stable")
+    keep = np.sort(small.drop_duplicates("key", keep="last").index.to_numpy())
+    return table.take(pa.array(keep))
+
+
+def _as_of_timestamp(as_of):
+    if as_of is None:
+        as_of = datetime.now(UTC)
+    as_of = pd.Timestamp(as_of)
+    return as_of.tz_localize("UTC") if as_of.tzinfo is None else as_of.tz_convert("UTC")
+
+
+def _as_of_table(as_of, root=DETAIL_HISTORY_DIR, columns=None) -> pa.Table | None:
+    as_of = _as_of_timestamp(as_of)
+    if columns is not None:
+        columns = columns + [OBSERVED_COL, DELETED_COL]
+    # Una compactación concurrente puede borrar archivos ya listados; su archivo compactado
+    # se publica antes de borrar, así que basta con volver a listar
+    for attempt in range(READ_ATTEMPTS):
+        files = [f for date, part in partitions(root) if date <= as_of.strftime("%Y-%m-%d")
+                 for f in _part_files(part)]
+        try:
+            table = read_files(files, columns)
+            break
+        except FileNotFoundError as e:
+            if attempt == READ_ATTEMPTS - 1:
+                raise
+            logging.info(f"Archivo compactado durante la lectura ({e}); se vuelve a listar")
+    if table is None:
+        return None
+    limit = pa.scalar(as_of.to_pydatetime(), type=pa.timestamp("us", tz="UTC")).cast(table.schema.field(OBSERVED_COL).type)
+    table = latest_per_record(table.filter(pc.less_equal(table[OBSERVED_COL], limit)))
+    if DELETED_COL in table.column_names:
+        # Los archivos anteriores a las lápidas no tienen la columna: nulo = presente
+        table = table.filter(pc.invert(pc.fill_null(table[DELETED_COL], False)))
+        table = table.drop_columns([DELETED_COL])
+    return table
+
+
+def read_detail_as_of(as_of=None, root=DETAIL_HISTORY_DIR) -> pd.DataFrame:
+    """
+    Detalle por fuente vigente en `as_of` (datetime o texto ISO-8601; por defecto ahora):
+    une las particiones hasta esa fecha, descarta observaciones posteriores, deja la última
+    de cada registro de origen y quita los que tienen una lápida como última observación.
+    """
+    table = _as_of_table(as_of, root)
+    return pd.DataFrame() if table is None else table.to_pandas()
+
+
+# --- Compactación ---
+
+def _acquire_lock(root):
+    lock = Path(root) / COMPACTION_LOCK_NAME
+    try:
+        if time.time() - lock.stat().st_mtime > LOCK_STALE_S:
+            lock.unlink(missing_ok=True)
+    except FileNotFoundError:
+        pass
+    try:
+        os.close(os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        return lock
+    except FileExistsError:
+        return None
+
+
+def pending_partitions(root=DETAIL_HISTORY_DIR, min_files=COMPACT_MIN_FILES):
+    """Particiones con al menos `min_files` archivos."""
+    return [part for _, part in partitions(root) if len(_part_files(part)) >= min_files]
+
+
+def compact_partition(part_dir):
+    """
+    Reescribe la partición como un único archivo con la última observación por registro
+    (lápidas incluidas). El archivo nuevo se publica antes de borrar los viejos: un lector
+    concurrente puede ver ambos un momento, pero latest_per_record los deduplica, y si un archivo
+    que ya había listado desaparece vuelve a listar. Devuelve (archivos antes, filas después).
+    """
+    files = _part_files(part_dir)
+    if len(files) < 2:
+        return len(files), None
+    table = latest_per_record(read_files(files))
+    write_parquet_atomic(table, Path(part_dir) / f"compacted-{_stamp()}-{uuid.uuid4().hex[:8]}.parquet")
+    for f in files:
+        f.unlink(missing_ok=True)
+    return len(files), table.num_rows
+
+
+def compact(root=DETAIL_HISTORY_DIR, min_files=2):
+    """Compacta las particiones con `min_files` archivos o más. Solo una compactación a la vez."""
+    root = Path(root)
+    if not root.exists():
+        logging.info(f"No hay histórico que compactar en {root}")
+        return
+    lock = _acquire_lock(root)
+    if lock is None:
+        logging.info("Ya hay una compactación en curso; se omite.")
+        return
+    try:
+        for part in pending_partitions(root, min_files):
+            before, rows = compact_partition(part)
+            logging.info(f"Compactada {part.name}: {before} archivos -> 1 ({rows} filas)")
+    finally:
+        lock.unlink(missing_ok=True)
+
+
+def start_background_compaction(root=DETAIL_HISTORY_DIR, min_files=COMPACT_MIN_FILES):
+    """
+    Lanza la compactación en un proceso aparte si alguna partición acumula `min_files` archivos,
+    para no alargar la integración. La salida va a .cache/compaction.log.
+    """
+    if not pending_partitions(root, min_files):
+        return None
+    COMPACTION_LOG_PATH.parent.mkdir(parents=True, exist_ok=True)
+    with open(COMPACTION_LOG_PATH, "ab") as log:
+        proc = subprocess.Popen(
+            [sys.executable, str(Path(__file__).resolve()), "--compact", "--root", str(root),
+             "--min-files", str(min_files)],
+            stdout=log, stderr=log, stdin=subprocess.DEVNULL, start_new_session=True,
+        )
+    logging.info(f"Compactación en segundo plano (pid {proc.pid}), log en {COMPACTION_LOG_PATH}")
+    return proc
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Histórico append-only de book_source_detail")
+    parser.add_argument("--root", type=Path, default=DETAIL_HISTORY_DIR)
+    parser.add_argument("--compact", action="store_true", help="Compacta las particiones con varios archivos")
+    parser.add_argument("--min-files", type=int, default=2)
+    parser.add_argument("--as-of", help="Muestra el número de registros vigentes en ese instante (ISO-8601)")
+    args = parser.parse_args()
+    if args.compact:
+        compact(args.root, args.min_files)
+    if args.as_of:
+        df = read_detail_as_of(args.as_of, args.root)
+        print(f"{len(df)} registros de origen vigentes en {args.as_of}")
@@ -1,17 +1,23 @@
 """
 Bloque 2: Enriquecimiento con Google Books API
 Lee el JSON de goodreads, busca cada libro y guarda los resultados en un CSV.
+Las búsquedas pasan por el motor de enrich_providers, así que se pueden añadir otros proveedores.
+Los resultados se escriben por lotes de tamaño fijo según llegan, así que la memoria no crece
+con el número de libros y una ejecución interrumpida deja un archivo legible.
 """
 
+import os
+import csv
 import requests
 import json
+import argparse
 import logging
-import pandas as pd
 from pathlib import Path
 
-# Imports absolutos desde el paquete src
-from utils_isbn import *
-from utils_quality import *
+# Imports absolutos desde el paquete src (pyarrow solo se carga con el sink Parquet)
+from utils_isbn import find_isbn
+from build_cache import check_stage, record_stage
+from enrich_providers import BookProvider, EnrichmentEngine
 
 # --- Definición de Rutas (Reemplaza a config.py) ---
 ROOT_DIR = Path(__file__).resolve().parents[1]
@@ -20,6 +26,8 @@ STANDARD_DIR = ROOT_DIR / "standard"
 DOCS_DIR = ROOT_DIR / "docs"
 GOODREADS_JSON_PATH = LANDING_DIR / "goodreads_books.json"
 GOOGLEBOOKS_CSV_PATH = LANDING_DIR / "googlebooks_books.csv"
+# Sink alternativo: un Parquet completo por lote dentro de este directorio
+GOOGLEBOOKS_PARQUET_DIR = LANDING_DIR / "googlebooks_books"
 
 
 def create_directories():
@@ -33,8 +41,33 @@ def create_directories():
 # --- Configuración ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-# API pública sin API key
-API_URL = "https://www.googleapis.com/books/v1/volumes"
+# API pública sin API key; GOOGLE_BOOKS_API_URL permite apuntar a un servidor local (googlebooks_stub)
+API_URL = os.environ.get("GOOGLE_BOOKS_API_URL", "https://www.googleapis.com/books/v1/volumes")
+
+# Esquema estable de salida (mismo orden de columnas que el CSV histórico)
+GOOGLE_COLUMNS = [
+    "gb_id", "title", "subtitle", "authors", "publisher", "pub_date", "language",
+    "categories", "isbn13", "isbn10", "price_amount", "price_currency",
+    "goodreads_title_query", "goodreads_author_query",
+]
+LIST_COLUMNS = {"authors", "categories"}
+FLOAT_COLUMNS = {"price_amount"}
+WRITE_BATCH_SIZE = 500
+
+# Caché de etapa
+STAGE_NAME = "enrich"
+STAGE_CODE = [ROOT_DIR / "src" / name for name in ("enrich_googlebooks.py", "enrich_providers.py", "utils_isbn.py")]
+
+
+def stage_spec(sink="csv", providers=None, mode="first"):
+    """Entradas, código, parámetros y salidas de la etapa de enriquecimiento para build_cache."""
+    names = [p.name for p in providers] if providers else [GoogleBooksProvider.name]
+    return {
+        "inputs": [GOODREADS_JSON_PATH],
+        "code": STAGE_CODE,
+        "params": {"api_url": API_URL, "max_results": 1, "sink": sink, "providers": names, "mode": mode},
+        "outputs": [GOOGLEBOOKS_CSV_PATH if sink == "csv" else GOOGLEBOOKS_PARQUET_DIR],
+    }
 
 
 def build_search_query(book):
@@ -78,67 +111,232 @@ def parse_google_book_data(item):
     }
 
 
-def enrich_books():
-    """
-    Función principal de enriquecimiento.
-    Lee JSON, llama a la API y guarda en CSV.
-    """
-    create_directories()
-
+def load_goodreads_books():
+    """Lee landing/goodreads_books.json. Devuelve None si falta o no es válido."""
     try:
         with open(GOODREADS_JSON_PATH, 'r', encoding='utf-8') as f:
             payload = json.load(f)
             # Admite {"metadata":..., "books":[...]} o lista directa
-            goodreads_books = payload["books"] if isinstance(payload, dict) and "books" in payload else payload
+            return payload["books"] if isinstance(payload, dict) and "books" in payload else payload
     except FileNotFoundError:
         logging.error(f"Archivo no encontrado: {GOODREADS_JSON_PATH}. Ejecuta scrape_goodreads.py primero.")
-        return
     except json.JSONDecodeError as e:
         logging.error(f"JSON inválido en {GOODREADS_JSON_PATH}: {e}")
+    return None
+
+
+class GoogleBooksProvider(BookProvider):
+    """Google Books: búsqueda por ISBN o título+autor, primer resultado."""
+
+    name = "google_books"
+
+    def __init__(self, api_url=None, min_interval_s=None):
+        super().__init__(min_interval_s)
+        self.api_url = api_url or API_URL
+
+    def build_request(self, book):
+        # sin 'key': llamadas públicas sin API key
+        return self.api_url, {"q": build_search_query(book), "maxResults": 1}
+
+    def parse_response(self, data, book):
+        if data.get('totalItems', 0) > 0 and 'items' in data:
+            parsed_data = parse_google_book_data(data['items'][0])
+            parsed_data['goodreads_title_query'] = book.get('title', '')
+            parsed_data['goodreads_author_query'] = book.get('author', '')
+            return parsed_data
+        return None
+
+
+GOOGLE_PROVIDER = GoogleBooksProvider()
+
+
+def enrich_book(book, session=None):
+    """
+    Busca un libro de Goodreads en Google Books.
+    Devuelve el registro parseado o None si no hay resultados o falla la llamada.
+    """
+    try:
+        parsed_data = GOOGLE_PROVIDER.lookup(book, session)
+        if parsed_data is not None:
+            logging.info(f"Enriquecido: {parsed_data.get('title')} (buscado por: {book.get('title', '')})")
+            return parsed_data
+        logging.warning(f"No se encontraron resultados en Google Books para: {book.get('title', '')}")
+    except requests.exceptions.RequestException as e:
+        logging.error(f"Error en la API de Google Books para query '{build_search_query(book)}': {e}")
+    except Exception as e:
+        logging.error(f"Error procesando libro {book.get('title', '')}: {e}")
+    return None
+
+
+def google_books_arrow_schema():
+    """Esquema Arrow de los registros enriquecidos (listas como list<string>)."""
+    import pyarrow as pa
+
+    types = {c: pa.list_(pa.string()) if c in LIST_COLUMNS else pa.float64() if c in FLOAT_COLUMNS else pa.string()
+             for c in GOOGLE_COLUMNS}
+    return pa.schema([(c, types[c]) for c in GOOGLE_COLUMNS])
+
+
+class StreamingBookWriter:
+    """
+    Escribe registros de Google Books por lotes de `batch_size` con un esquema fijo.
+
+    - sink="csv": añade filas al CSV de landing (mismo formato que pandas.to_csv; las listas
+      se guardan como su repr para que integrate_pipeline las siga parseando) y vacía el
+      buffer del archivo en cada lote.
+    - sink="parquet": cada lote es un Parquet completo (part-00000.parquet, ...) dentro de
+      un directorio, legible con pyarrow.parquet.read_table(directorio) aunque el proceso muera.
+      integrate_pipeline lo lee en lugar del CSV cuando es más reciente.
+
+    El archivo no se toca hasta el primer lote, así que una ejecución sin resultados no
+    sobrescribe el anterior.
+    """
+
+    def __init__(self, path, sink="csv", batch_size=WRITE_BATCH_SIZE):
+        if sink not in ("csv", "parquet"):
+            raise ValueError(f"Sink desconocido: {sink}. Usa 'csv' o 'parquet'")
+        self.path = Path(path)
+        self.sink = sink
+        self.batch_size = batch_size
+        self.rows_written = 0
+        self._buffer = []
+        self._file = None
+        self._csv = None
+        self._parts = 0
+        self._schema = None
+
+    def write(self, record):
+        self._buffer.append(record)
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        if self.sink == "csv":
+            self._flush_csv()
+        else:
+            self._flush_parquet()
+        self.rows_written += len(self._buffer)
+        self._buffer = []
+
+    def _flush_csv(self):
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, 'w', encoding='utf-8', newline='')
+            self._csv = csv.writer(self._file, lineterminator='\n')
+            self._csv.writerow(GOOGLE_COLUMNS)
+        self._csv.writerows([self._csv_value(r.get(c), c in FLOAT_COLUMNS) for c in GOOGLE_COLUMNS]
+                            for r in self._buffer)
+        self._file.flush()
+
+    @staticmethod
+    def _csv_value(value, is_float=False):
+        if value is None:
+            return ""
+        if isinstance(value, list):
+            return str(value)
+        # pandas escribía la columna entera como float: 10 -> "10.0"
+        if is_float:
+            return repr(float(value))
+        return value
+
+    def _flush_parquet(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if self._schema is None:
+            self._schema = google_books_arrow_schema()
+            self.path.mkdir(parents=True, exist_ok=True)
+            for old in self.path.glob("part-*.parquet"):
+                old.unlink()
+        columns = {c: [r.get(c) for r in self._buffer] for c in GOOGLE_COLUMNS}
+        for c in FLOAT_COLUMNS:
+            columns[c] = [None if v is None else float(v) for v in columns[c]]
+        batch = pa.RecordBatch.from_pydict(columns, schema=self._schema)
+        part = self.path / f"part-{self._parts:05d}.parquet"
+        tmp = part.with_name(part.name + ".tmp")
+        pq.write_table(pa.Table.from_batches([batch]), tmp)
+        os.replace(tmp, part)
+        self._parts += 1
+
+    def close(self):
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def _sink_path(sink):
+    return GOOGLEBOOKS_CSV_PATH if sink == "csv" else GOOGLEBOOKS_PARQUET_DIR
+
+
+def save_google_books(enriched_data, sink="csv"):
+    """Guarda los registros enriquecidos en landing/googlebooks_books.csv (o el sink Parquet)."""
+    create_directories()
+    with StreamingBookWriter(_sink_path(sink), sink) as writer:
+        for record in enriched_data:
+            writer.write(record)
+    if writer.rows_written:
+        logging.info(f"Enriquecimiento finalizado. {writer.rows_written} libros guardados en {writer.path}")
+        return True
+    logging.warning("No se enriqueció ningún libro.")
+    return False
+
+
+def enrich_books(force=False, sink="csv", batch_size=WRITE_BATCH_SIZE, providers=None, mode="first"):
+    """
+    Función principal de enriquecimiento.
+    Lee JSON, consulta a los proveedores (por defecto solo Google Books) con EnrichmentEngine
+    y guarda en CSV (por lotes, según llegan los resultados).
+    Se omite si goodreads_books.json y el código no han cambiado desde la última ejecución.
+    """
+    create_directories()
+
+    goodreads_books = load_goodreads_books()
+    if goodreads_books is None:
         return
 
+    providers = providers or [GOOGLE_PROVIDER]
+    spec = stage_spec(sink, providers, mode)
+    run, reason, fingerprint = check_stage(STAGE_NAME, **spec, force=force)
+    if not run:
+        logging.info(f"Enriquecimiento omitido: {reason}. Usa --force para volver a consultar la API.")
+        return
+    logging.info(f"Enriquecimiento necesario: {reason}")
+
     logging.info(f"Cargados {len(goodreads_books)} libros desde {GOODREADS_JSON_PATH}")
-    enriched_data = []
-
-    for book in goodreads_books:
-        query = build_search_query(book)
-        params = {
-            "q": query,
-            "maxResults": 1
-            # sin 'key': llamadas públicas sin API key
-        }
-
-        try:
-            response = requests.get(API_URL, params=params, timeout=20)
-            response.raise_for_status()
-            data = response.json()
-
-            if data.get('totalItems', 0) > 0 and 'items' in data:
-                item = data['items'][0]
-                parsed_data = parse_google_book_data(item)
-                parsed_data['goodreads_title_query'] = book.get('title', '')
-                parsed_data['goodreads_author_query'] = book.get('author', '')
-                enriched_data.append(parsed_data)
+    writer = StreamingBookWriter(_sink_path(sink), sink, batch_size)
+
+    with EnrichmentEngine(providers, mode) as engine, writer:
+        for book in goodreads_books:
+            parsed_data = engine.enrich(book)
+            if parsed_data is not None:
                 logging.info(f"Enriquecido: {parsed_data.get('title')} (buscado por: {book.get('title', '')})")
+                writer.write(parsed_data)
             else:
-                logging.warning(f"No se encontraron resultados en Google Books para: {book.get('title', '')}")
-        except requests.exceptions.RequestException as e:
-            logging.error(f"Error en la API de Google Books para query '{query}': {e}")
-        except Exception as e:
-            logging.error(f"Error procesando libro {book.get('title', '')}: {e}")
-
-    if enriched_data:
-        df = pd.DataFrame(enriched_data)
-        df.to_csv(
-            GOOGLEBOOKS_CSV_PATH,
-            index=False,
-            sep=',',
-            encoding='utf-8'
-        )
-        logging.info(f"Enriquecimiento finalizado. {len(df)} libros guardados en {GOOGLEBOOKS_CSV_PATH}")
+                logging.warning(f"Ningún proveedor encontró: {book.get('title', '')}")
+    engine.log_stats()
+
+    if writer.rows_written:
+        logging.info(f"Enriquecimiento finalizado. {writer.rows_written} libros guardados en {writer.path}")
+        record_stage(STAGE_NAME, fingerprint, spec["outputs"])
     else:
         logging.warning("No se enriqueció ningún libro.")
 
 
 if __name__ == "__main__":
-    enrich_books()
+    parser = argparse.ArgumentParser(description="Enriquecimiento de los libros de Goodreads con Google Books")
+    parser.add_argument("--force", action="store_true", help="Consulta la API aunque la entrada no haya cambiado")
+    parser.add_argument("--sink", choices=["csv", "parquet"], default="csv")
+    parser.add_argument("--batch-size", type=int, default=WRITE_BATCH_SIZE)
+    parser.add_argument("--mode", choices=["first", "merge"], default="first",
+                        help="Primera respuesta suficiente o combinación de todos los proveedores")
+    args = parser.parse_args()
+    enrich_books(force=args.force, sink=args.sink, batch_size=args.batch_size, mode=args.mode)
@@ -0,0 +1,355 @@
+"""
+Bloque 2: Proveedores de metadatos y motor de enriquecimiento en paralelo
+Cada proveedor define cómo construir la petición para un libro, cómo parsear la respuesta
+y su límite de ritmo. El motor consulta a la vez a todos los proveedores configurados y
+devuelve la primera respuesta suficiente (modo "first") o la combinación de todas (modo "merge"),
+con estadísticas de latencia y aciertos por proveedor.
+"""
+import time
+import random
+import logging
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import requests
+
+MODES = ("first", "merge")
+# Una respuesta es suficiente si identifica el libro: título y algún ISBN
+SUFFICIENT_FIELDS = ("title",)
+SUFFICIENT_ANY = ("isbn13", "isbn10")
+# Tiempo máximo que el motor espera por un libro antes de quedarse con lo que tenga
+ENGINE_TIMEOUT_S = 30
+# Respuestas HTTP que se reintentan (cuota agotada o fallo temporal del servidor)
+RETRY_STATUS = {429, 500, 502, 503, 504}
+MAX_RETRIES = 2
+RETRY_BACKOFF_S = 0.5
+# Hilos del pool de cada proveedor en el motor (llamadas simultáneas a un mismo proveedor)
+WORKERS_PER_PROVIDER = 4
+# Latencias guardadas por proveedor para los percentiles (muestreo de reservorio): memoria fija
+LATENCY_SAMPLE_SIZE = 2048
+
+
+def is_sufficient(record):
+    return (
+        record is not None
+        and all(record.get(f) for f in SUFFICIENT_FIELDS)
+        and any(record.get(f) for f in SUFFICIENT_ANY)
+    )
+
+
+def merge_records(records):
+    """Combina registros en orden de prioridad: para cada campo, el primer valor no vacío."""
+    merged = {}
+    for record in records:
+        for key, value in record.items():
+            if merged.get(key) in (None, "", []) and value not in (None, "", []):
+                merged[key] = value
+            else:
+                merged.setdefault(key, value)
+    return merged or None
+
+
+class BookProvider(ABC):
+    """
+    Proveedor de metadatos de libros por HTTP.
+    Las subclases definen `name`, build_request() y parse_response(); `min_interval_s`
+    limita el ritmo de llamadas (compartido entre hilos). Los 429 y 5xx se reintentan
+    hasta `max_retries` veces, respetando Retry-After si viene; si pide esperar más que
+    `timeout_s`, se deja de reintentar y se propaga el error.
+    """
+
+    name = "base"
+    min_interval_s = 0.0
+    timeout_s = 20
+    max_retries = MAX_RETRIES
+    retry_backoff_s = RETRY_BACKOFF_S
+
+    def __init__(self, min_interval_s=None):
+        if min_interval_s is not None:
+            self.min_interval_s = min_interval_s
+        self._rate_lock = threading.Lock()
+        self._next_slot = 0.0
+        self._local = threading.local()
+
+    @abstractmethod
+    def build_request(self, book):
+        """(url, params) de la búsqueda, o None si el proveedor no puede buscar este libro."""
+
+    @abstractmethod
+    def parse_response(self, data, book):
+        """Registro con el esquema de landing (GOOGLE_COLUMNS) o None si no hay resultados."""
+
+    def wait_turn(self):
+        """Reserva el siguiente hueco según min_interval_s y espera hasta él."""
+        if not self.min_interval_s:
+            return
+        with self._rate_lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.min_interval_s
+        if slot > now:
+            time.sleep(slot - now)
+
+    def _session(self):
+        # requests.Session no es seguro entre hilos: una por hilo
+        if getattr(self._local, "session", None) is None:
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def lookup(self, book, session=None):
+        """Consulta al proveedor. Los errores HTTP se propagan; el motor los cuenta."""
+        request = self.build_request(book)
+        if request is None:
+            return None
+        url, params = request
+        http = session or self._session()
+        for attempt in range(self.max_retries + 1):
+            self.wait_turn()
+            response = http.get(url, params=params, timeout=self.timeout_s)
+            if response.status_code not in RETRY_STATUS or attempt == self.max_retries:
+                break
+            delay = self._retry_delay(response, attempt)
+            if delay is None:
+                logging.warning(f"{self.name}: Retry-After {response.headers.get('Retry-After')} s supera "
+                                f"{self.timeout_s} s; no se reintenta")
+                break
+            time.sleep(delay)
+        response.raise_for_status()
+        return self.parse_response(response.json(), book)
+
+    def _retry_delay(self, response, attempt):
+        """Espera antes del siguiente intento, o None si Retry-After pide más que timeout_s."""
+        retry_after = response.headers.get("Retry-After")
+        try:
+            delay = max(0.0, float(retry_after))
+        except (TypeError, ValueError):
+            return min(self.retry_backoff_s * 2 ** attempt, self.timeout_s)
+        return delay if delay <= self.timeout_s else None
+
+
+class StubResponse:
+    """Respuesta HTTP mínima (status, cabeceras, JSON) para StubSession."""
+
+    def __init__(self, status_code, payload=None, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self._payload = payload or {}
+
+    def json(self):
+        return self._payload
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} simulado", response=self)
+
+
+class StubSession:
+    """
+    Sesión local que sustituye a requests.Session: espera `latency_s` y devuelve, para cada
+    título, los códigos de `statuses` en sus primeras llamadas y 200 después (siempre 500 con `fail`).
+    """
+
+    def __init__(self, latency_s=0.0, fail=False, statuses=(), retry_after_s=None):
+        self.latency_s = latency_s
+        self.fail = fail
+        self.statuses = list(statuses)
+        self.retry_after_s = retry_after_s
+        self.calls = 0
+        self._attempts = {}
+        self._lock = threading.Lock()
+
+    def get(self, url, params=None, timeout=None):
+        title = (params or {}).get("title", "")
+        with self._lock:
+            self.calls += 1
+            attempt = self._attempts.get(title, 0)
+            self._attempts[title] = attempt + 1
+        time.sleep(self.latency_s)
+        if self.fail:
+            return StubResponse(500)
+        status = self.statuses[attempt] if attempt < len(self.statuses) else 200
+        headers = {"Retry-After": str(self.retry_after_s)} if status == 429 and self.retry_after_s is not None else {}
+        return StubResponse(status, headers=headers)
+
+
+class StubProvider(BookProvider):
+    """
+    Proveedor local para pruebas: responde desde un dict (clave: título de Goodreads) o una
+    función book -> registro. Pasa por el mismo lookup que los proveedores reales (petición,
+    reintentos, parseo) sobre una StubSession con la latencia, los fallos y los códigos indicados.
+    """
+
+    retry_backoff_s = 0.01
+
+    def __init__(self, name, answers=None, latency_s=0.0, fail=False, statuses=(), retry_after_s=None,
+                 min_interval_s=None):
+        super().__init__(min_interval_s)
+        self.name = name
+        self.answers = answers or {}
+        self.session = StubSession(latency_s, fail, statuses, retry_after_s)
+
+    def _session(self):
+        return self.session
+
+    def build_request(self, book):
+        return f"stub://{self.name}/volumes", {"title": book.get("title", "")}
+
+    def parse_response(self, data, book):
+        if callable(self.answers):
+            return self.answers(book)
+        record = self.answers.get(book.get("title", ""))
+        return dict(record) if record else None
+
+
+class ProviderStats:
+    """
+    Llamadas, aciertos, errores, respuestas usadas y latencias de un proveedor.
+    La media es exacta; los percentiles salen de una muestra de reservorio de `sample_size`
+    latencias, así que la memoria no crece con el número de llamadas.
+    """
+
+    def __init__(self, sample_size=LATENCY_SAMPLE_SIZE, seed=0):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.hits = 0
+        self.errors = 0
+        self.used = 0
+        self.latency_total = 0.0
+        self.sample_size = sample_size
+        self.latencies = []
+        self._rng = random.Random(seed)
+
+    def record(self, latency_s, hit, error):
+        with self._lock:
+            self.calls += 1
+            self.hits += int(hit)
+            self.errors += int(error)
+            self.latency_total += latency_s
+            if len(self.latencies) < self.sample_size:
+                self.latencies.append(latency_s)
+            else:
+                slot = self._rng.randrange(self.calls)
+                if slot < self.sample_size:
+                    self.latencies[slot] = latency_s
+
+    def mark_used(self):
+        with self._lock:
+            self.used += 1
+
+    def summary(self):
+        with self._lock:
+            lat = sorted(self.latencies)
+            mean = self.latency_total / self.calls if self.calls else None
+
+        def pct(p):
+            return round(lat[min(len(lat) - 1, int(p * len(lat)))] * 1000, 1) if lat else None
+
+        return {
+            "llamadas": self.calls,
+            "aciertos": self.hits,
+            "tasa_acierto": round(self.hits / self.calls, 3) if self.calls else None,
+            "errores": self.errors,
+            "usadas": self.used,
+            "latencia_media_ms": round(mean * 1000, 1) if mean is not None else None,
+            "latencia_p50_ms": pct(0.50),
+            "latencia_p95_ms": pct(0.95),
+        }
+
+
+class EnrichmentEngine:
+    """
+    Consulta a todos los proveedores a la vez para cada libro.
+
+    - mode="first": devuelve la primera respuesta suficiente (is_sufficient) en cuanto llega,
+      sin esperar a los demás, así que la latencia la marca el proveedor más rápido que sabe
+      responder. Si ninguna es suficiente, combina las que haya.
+    - mode="merge": espera a todos y combina las respuestas en el orden de `providers`.
+
+    Cada proveedor tiene su propio pool de `max_workers` hilos, así que un proveedor lento no
+    hace esperar en cola a las llamadas de los demás. Cuando ya hay respuesta, las llamadas que
+    aún no habían empezado se cancelan (no gastan turnos de min_interval_s); las que están en
+    curso terminan en segundo plano y solo cuentan para las estadísticas.
+    """
+
+    def __init__(self, providers, mode="first", sufficient=is_sufficient, timeout_s=ENGINE_TIMEOUT_S,
+                 max_workers=None):
+        if mode not in MODES:
+            raise ValueError(f"Modo desconocido: {mode}. Usa uno de {MODES}")
+        if not providers:
+            raise ValueError("Hace falta al menos un proveedor")
+        self.providers = list(providers)
+        self.mode = mode
+        self.sufficient = sufficient
+        self.timeout_s = timeout_s
+        self.stats = {p.name: ProviderStats() for p in self.providers}
+        self._pools = {p.name: ThreadPoolExecutor(max_workers=max_workers or WORKERS_PER_PROVIDER,
+                                                  thread_name_prefix=f"provider-{p.name}")
+                       for p in self.providers}
+
+    def _call(self, provider, book):
+        start = time.perf_counter()
+        try:
+            record = provider.lookup(book)
+        except Exception as e:
+            self.stats[provider.name].record(time.perf_counter() - start, hit=False, error=True)
+            logging.warning(f"Proveedor {provider.name} falló para '{book.get('title', '')}': {type(e).__name__}: {e}")
+            return None
+        self.stats[provider.name].record(time.perf_counter() - start, hit=record is not None, error=False)
+        return record
+
+    def enrich(self, book):
+        """Registro enriquecido del libro, o None si ningún proveedor lo encuentra."""
+        futures = {self._pools[p.name].submit(self._call, p, book): p for p in self.providers}
+        priority = {p.name: i for i, p in enumerate(self.providers)}
+        answers = {}
+        pending = set(futures)
+        deadline = time.monotonic() + self.timeout_s
+
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()),
+                                 return_when=FIRST_COMPLETED)
+            if not done:
+                logging.warning(f"Tiempo agotado esperando proveedores para '{book.get('title', '')}'")
+                break
+            for future in done:
+                record = future.result()
+                if record is None:
+                    continue
+                provider = futures[future]
+                answers[provider.name] = record
+                if self.mode == "first" and self.sufficient(record):
+                    self.stats[provider.name].mark_used()
+                    self._cancel(pending)
+                    return record
+        self._cancel(pending)
+
+        if not answers:
+            return None
+        names = sorted(answers, key=priority.get)
+        for name in names:
+            self.stats[name].mark_used()
+        return merge_records([answers[n] for n in names])
+
+    @staticmethod
+    def _cancel(futures):
+        # Solo se cancelan las que siguen en cola; las que ya corren no se pueden interrumpir
+        for future in futures:
+            future.cancel()
+
+    def stats_summary(self):
+        return {name: s.summary() for name, s in self.stats.items()}
+
+    def log_stats(self):
+        for name, summary in self.stats_summary().items():
+            logging.info(f"Proveedor {name}: {summary}")
+
+    def close(self):
+        for pool in self._pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,265 @@
+"""
+Servidor local que imita /books/v1/volumes de Google Books y banco de carga del enriquecimiento.
+Las respuestas tienen la forma que espera parse_google_book_data; la latencia (lognormal),
+la tasa de errores 500 y 429 y la proporción de búsquedas sin resultados son configurables.
+Si una búsqueda tiene resultados o no depende solo de la query, así que el banco de carga sabe
+qué filas debían volver y cuenta las perdidas y las inesperadas.
+
+Servidor:      python src/googlebooks_stub.py --port 8766
+Enriquecer:    GOOGLE_BOOKS_API_URL=http://127.0.0.1:8766/books/v1/volumes python src/enrich_googlebooks.py
+Banco de carga: python src/cli.py loadtest-enrich --books 2000 --concurrency 16
+"""
+import sys
+import json
+import time
+import random
+import hashlib
+import logging
+import argparse
+import threading
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT_DIR / "src"))
+
+from utils_isbn import complete_isbn13
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+VOLUMES_PATH = "/books/v1/volumes"
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8766
+
+# Perfil por defecto: latencia mediana de 80 ms con cola larga y algo de cuota agotada
+DEFAULT_CONFIG = {
+    "latency_ms": 80.0,
+    "latency_sigma": 0.5,
+    "error_rate": 0.01,
+    "rate_429": 0.02,
+    "no_results_ratio": 0.1,
+    "retry_after_s": 0.05,
+    "seed": 0,
+}
+CATEGORIES = ["Computers", "Science", "Mathematics", "Business & Economics", "Psychology"]
+
+
+def _digest(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def has_results(query, no_results_ratio):
+    """Decisión determinista por query: la misma búsqueda siempre encuentra (o no) resultados."""
+    return int(_digest(query)[:8], 16) / 0xFFFFFFFF >= no_results_ratio
+
+
+def fake_volume(query):
+    """Volumen con la forma de la API, derivado de la query (ISBN o intitle/inauthor)."""
+    h = _digest(query)
+    if query.startswith("isbn:"):
+        title, author = f"Book {query[5:]}", "Unknown Author"
+    else:
+        parts = dict(p.split(":", 1) for p in query.split("+") if ":" in p)
+        title, author = parts.get("intitle", query), parts.get("inauthor", "")
+    isbn13 = complete_isbn13("978" + str(int(h[:12], 16))[:9].zfill(9))
+    n = int(h[12:14], 16)
+    return {
+        "kind": "books#volume",
+        "id": h[:12],
+        "volumeInfo": {
+            "title": title,
+            "authors": [author] if author else [],
+            "publisher": f"Publisher {n % 40}",
+            "publishedDate": f"{1990 + n % 35}-0{1 + n % 9}-1{n % 10}",
+            "industryIdentifiers": [{"type": "ISBN_13", "identifier": isbn13}],
+            "categories": [CATEGORIES[n % len(CATEGORIES)]],
+            "language": "en" if n % 3 else "es",
+        },
+        "saleInfo": {"listPrice": {"amount": round(5 + n % 60 + 0.99, 2), "currencyCode": "USD"}}
+        if n % 2 else {"saleability": "NOT_FOR_SALE"},
+    }
+
+
+# --- Servidor ---
+
+def make_handler(config, stats):
+    rng = random.Random(config["seed"])
+    rng_lock = threading.Lock()
+    stats_lock = threading.Lock()
+
+    def count(key):
+        with stats_lock:
+            stats[key] = stats.get(key, 0) + 1
+
+    def draw():
+        with rng_lock:
+            return rng.random(), rng.random(), rng.lognormvariate(0.0, config["latency_sigma"])
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Cabeceras y cuerpo van en escrituras separadas: sin esto, Nagle + ACK retardado suman ~40 ms
+        disable_nagle_algorithm = True
+
+        def _send(self, status, payload, headers=None):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=UTF-8")
+            self.send_header("Content-Length", str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path != VOLUMES_PATH:
+                count("404")
+                return self._send(404, {"error": {"code": 404, "message": "Not Found"}})
+            query = parse_qs(url.query).get("q", [""])[0]
+
+            roll_429, roll_error, latency_factor = draw()
+            time.sleep(config["latency_ms"] * latency_factor / 1000)
+
+            if roll_429 < config["rate_429"]:
+                count("429")
+                return self._send(429, {"error": {"code": 429, "message": "Rate Limit Exceeded"}},
+                                  {"Retry-After": str(config["retry_after_s"])})
+            if roll_error < config["error_rate"]:
+                count("500")
+                return self._send(500, {"error": {"code": 500, "message": "Backend Error"}})
+            if not query or not has_results(query, config["no_results_ratio"]):
+                count("sin_resultados")
+                return self._send(200, {"kind": "books#volumes", "totalItems": 0})
+            count("200")
+            return self._send(200, {"kind": "books#volumes", "totalItems": 1, "items": [fake_volume(query)]})
+
+        def log_message(self, format, *args):
+            logging.debug(f"{self.address_string()} - {format % args}")
+
+    return StubHandler
+
+
+def start_stub_server(config=None, host=DEFAULT_HOST, port=0):
+    """Arranca el servidor en un hilo. Devuelve (server, url del endpoint, stats por código de respuesta)."""
+    config = {**DEFAULT_CONFIG, **(config or {})}
+    stats = {}
+    server = ThreadingHTTPServer((host, port), make_handler(config, stats))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://{host}:{server.server_address[1]}{VOLUMES_PATH}"
+    return server, url, stats
+
+
+def serve(config=None, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    config = {**DEFAULT_CONFIG, **(config or {})}
+    server = ThreadingHTTPServer((host, port), make_handler(config, {}))
+    logging.info(f"Stub de Google Books en http://{host}:{port}{VOLUMES_PATH} con {config}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+# --- Banco de carga ---
+
+def synthetic_books(n_books, seed=0):
+    """Libros de Goodreads sintéticos: unos con ISBN y la mayoría por título+autor."""
+    rng = random.Random(seed)
+    books = []
+    for i in range(n_books):
+        book = {"title": f"Load Test Book {i}", "author": f"Author {rng.randint(0, n_books // 5)}"}
+        if i % 4 == 0:
+            book["isbn13"] = f"978{i:010d}"
+        books.append(book)
+    return books
+
+
+def _pct(values, p):
+    return round(values[min(len(values) - 1, int(p * len(values)))] * 1000, 1) if values else None
+
+
+def run_load_test(n_books=2000, concurrency=16, config=None, api_url=None, max_retries=None):
+    """
+    Enriquece `n_books` libros sintéticos contra el stub (o `api_url`) con `concurrency` hilos,
+    usando GoogleBooksProvider y EnrichmentEngine como enrich_books.
+    Devuelve throughput, percentiles de latencia por libro, filas perdidas (esperadas que no
+    volvieron), filas inesperadas (volvieron sin esperarse) y respuestas del stub.
+    """
+    from enrich_googlebooks import GoogleBooksProvider, build_search_query
+    from enrich_providers import EnrichmentEngine
+
+    config = {**DEFAULT_CONFIG, **(config or {})}
+    server, stats = None, {}
+    if api_url is None:
+        server, api_url, stats = start_stub_server(config)
+
+    provider = GoogleBooksProvider(api_url=api_url, min_interval_s=0)
+    if max_retries is not None:
+        provider.max_retries = max_retries
+    books = synthetic_books(n_books, config["seed"])
+    expected = [has_results(build_search_query(b), config["no_results_ratio"]) for b in books]
+
+    def one(book):
+        start = time.perf_counter()
+        record = engine.enrich(book)
+        return record, time.perf_counter() - start
+
+    try:
+        with EnrichmentEngine([provider], max_workers=concurrency) as engine, \
+                ThreadPoolExecutor(max_workers=concurrency) as pool:
+            start = time.perf_counter()
+            results = list(pool.map(one, books))
+            elapsed = time.perf_counter() - start
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+
+    latencies = sorted(lat for _, lat in results)
+    found = sum(record is not None for record, _ in results)
+    lost = sum(exp and record is None for exp, (record, _) in zip(expected, results))
+    unexpected = sum(record is not None and not exp for exp, (record, _) in zip(expected, results))
+    return {
+        "libros": n_books,
+        "concurrencia": concurrency,
+        "segundos": round(elapsed, 2),
+        "libros_por_segundo": round(n_books / elapsed, 1),
+        "latencia_p50_ms": _pct(latencies, 0.50),
+        "latencia_p90_ms": _pct(latencies, 0.90),
+        "latencia_p99_ms": _pct(latencies, 0.99),
+        "latencia_max_ms": _pct(latencies, 1.0),
+        "encontrados": found,
+        "esperados": sum(expected),
+        "filas_perdidas": lost,
+        "filas_inesperadas": unexpected,
+        "respuestas_stub": stats,
+        "config": config,
+    }
+
+
+def config_from_args(args):
+    """Config del stub a partir de las opciones de línea de comandos indicadas."""
+    return {key: getattr(args, key) for key in DEFAULT_CONFIG if getattr(args, key, None) is not None}
+
+
+def add_config_arguments(parser):
+    parser.add_argument("--latency-ms", type=float, help="Latencia mediana (lognormal)")
+    parser.add_argument("--latency-sigma", type=float, help="Dispersión de la latencia (sigma lognormal)")
+    parser.add_argument("--error-rate", type=float, help="Proporción de respuestas 500")
+    parser.add_argument("--rate-429", type=float, help="Proporción de respuestas 429")
+    parser.add_argument("--no-results-ratio", type=float, help="Proporción de búsquedas sin resultados")
+    parser.add_argument("--retry-after-s", type=float, help="Retry-After de las respuestas 429")
+    parser.add_argument("--seed", type=int)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stub local de la API de Google Books")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+    serve(config_from_args(args), args.host, args.port)
@@ -5,11 +5,14 @@ Bloque 3: Integración y Estandarización
 
 import sys
 import json
+import argparse
 import logging
 import hashlib
+import functools
 from pathlib import Path
 from datetime import datetime, UTC
 import ast
+from contextlib import nullcontext
 
 import pandas as pd
 import numpy as np
@@ -21,8 +24,15 @@ ROOT_DIR = Path(__file__).resolve().parents[1]
 sys.path.insert(0, str(ROOT_DIR / "src"))
 
 # Se asume que utils_isbn.py y utils_quality.py ya contienen las últimas correcciones
-from utils_isbn import *
-from utils_quality import *
+from utils_isbn import normalize_isbn
+from utils_quality import clean_string, normalize_date, normalize_language, normalize_currency
+from build_cache import check_stage, record_stage
+from utils_arrow import dictionary_list_series, write_ipc_atomic, write_parquet_atomic
+from utils_cdc import capture_changes
+from detail_history import DETAIL_HISTORY_DIR, append_detail, start_background_compaction
+from utils_memory import (
+    INTEGRATION_EXPANSION_FACTOR, MemoryBudgetError, check_estimate, frame_bytes, track_stage, tracing,
+)
 
 # Rutas
 LANDING_DIR = ROOT_DIR / "landing"
@@ -32,13 +42,48 @@ DOCS_DIR = ROOT_DIR / "docs"
 # Entradas
 GOODREADS_JSON_PATH = LANDING_DIR / "goodreads_books.json"
 GOOGLEBOOKS_CSV_PATH = LANDING_DIR / "googlebooks_books.csv"
+# Sink alternativo del enriquecimiento (enrich_googlebooks.py --sink parquet)
+GOOGLEBOOKS_PARQUET_DIR = LANDING_DIR / "googlebooks_books"
 
 # Salidas
 DIM_BOOK_PATH = STANDARD_DIR / "dim_book.parquet"
-DETAIL_BOOK_PATH = STANDARD_DIR / "book_source_detail.parquet"
+# Detalle por fuente: dataset append-only particionado por fecha de ingesta (detail_history)
+DETAIL_BOOK_PATH = DETAIL_HISTORY_DIR
+# Cambios de dim_book respecto al snapshot anterior (insert/update/delete)
+DIM_BOOK_CHANGES_PATH = STANDARD_DIR / "dim_book_changes.parquet"
+# Salida opcional Arrow IPC (sin comprimir) para lectores con memory-map
+DIM_BOOK_ARROW_PATH = STANDARD_DIR / "dim_book.arrow"
+DETAIL_BOOK_ARROW_PATH = STANDARD_DIR / "book_source_detail.arrow"
 QUALITY_METRICS_PATH = DOCS_DIR / "quality_metrics.json"
 SCHEMA_MD_PATH = DOCS_DIR / "schema.md"
 
+# Caché de etapa: código y parámetros que determinan las salidas
+STAGE_NAME = "integrate"
+STAGE_CODE = [
+    ROOT_DIR / "src" / name
+    for name in ("integrate_pipeline.py", "utils_isbn.py", "utils_quality.py", "utils_arrow.py", "utils_cdc.py",
+                 "detail_history.py", "utils_memory.py")
+]
+
+
+# Columnas de listas de textos repetidos; en las salidas son list<dictionary<string>>
+LIST_COLUMNS = ["authors", "categories"]
+# Los mismos autores y categorías se repiten en todo el catálogo: cada texto distinto se limpia una sola vez
+clean_label = functools.lru_cache(maxsize=1 << 16)(clean_string)
+
+
+def stage_spec(arrow_ipc=False):
+    """Entradas, código, parámetros y salidas de la etapa de integración para build_cache."""
+    outputs = [DIM_BOOK_PATH, DETAIL_BOOK_PATH, DIM_BOOK_CHANGES_PATH, QUALITY_METRICS_PATH, SCHEMA_MD_PATH]
+    if arrow_ipc:
+        outputs += [DIM_BOOK_ARROW_PATH, DETAIL_BOOK_ARROW_PATH]
+    return {
+        "inputs": [GOODREADS_JSON_PATH, *google_landing_files()],
+        "code": STAGE_CODE,
+        "params": {"pandas": pd.__version__, "pyarrow": pa.__version__, "arrow_ipc": arrow_ipc},
+        "outputs": outputs,
+    }
+
 # Logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
@@ -48,8 +93,10 @@ def create_directories():
     DOCS_DIR.mkdir(parents=True, exist_ok=True)
 
 
-def ensure_columns(df: pd.DataFrame, required_cols):
-    df = df.copy()
+def ensure_columns(df: pd.DataFrame, required_cols, copy=True):
+    """Añade como nulas las columnas que falten. Con copy=False modifica `df` (úsalo solo si es tuyo)."""
+    if copy:
+        df = df.copy()
     df.columns = df.columns.map(str).str.strip()
     missing = [c for c in required_cols if c not in df.columns]
     for c in missing:
@@ -108,6 +155,9 @@ def parse_list_string(s: pd.Series) -> pd.Series:
     Convierte strings de lista (ej. "['a', 'b']") a listas reales de Python.
     """
     def attempt_parse(item):
+        # Los registros en memoria (run_pipeline) ya traen listas reales
+        if isinstance(item, list):
+            return item
         if pd.isna(item):
             return item
         try:
@@ -118,64 +168,111 @@ def parse_list_string(s: pd.Series) -> pd.Series:
     return s.apply(attempt_parse)
 
 
+GOODREADS_REQUIRED = ["title", "author", "rating", "ratings_count", "book_url", "isbn10", "isbn13"]
+
+GOOGLE_REQUIRED = [
+    "gb_id", "title", "subtitle", "authors", "publisher", "pub_date", "language",
+    "categories", "isbn13", "isbn10", "price_amount", "price_currency",
+    "goodreads_title_query", "goodreads_author_query",
+]
+
+
+def goodreads_frame(records) -> pd.DataFrame:
+    """DataFrame de Goodreads a partir de los registros del scraper."""
+    return ensure_columns(pd.DataFrame(records), GOODREADS_REQUIRED, copy=False)
+
+
+def google_frame(records) -> pd.DataFrame:
+    """
+    DataFrame de Google Books a partir de registros en memoria,
+    con los mismos tipos que produce la lectura del CSV de landing.
+    """
+    df = ensure_columns(pd.DataFrame(records), GOOGLE_REQUIRED, copy=False)
+    for col in ["isbn13", "isbn10"]:
+        df[col] = df[col].astype("string")
+    df["price_amount"] = pd.to_numeric(df["price_amount"], errors="coerce")
+    return df
+
+
 def load_goodreads():
     with open(GOODREADS_JSON_PATH, "r", encoding="utf-8") as f:
         payload = json.load(f)
 
     records = payload["books"] if isinstance(payload, dict) and "books" in payload else payload
-    df = pd.DataFrame(records)
-
-    required = ["title", "author", "rating", "ratings_count", "book_url", "isbn10", "isbn13"]
-    df = ensure_columns(df, required)
+    df = goodreads_frame(records)
 
     logging.info(f"Cargado {GOODREADS_JSON_PATH} ({len(df)} filas)")
     return df
 
 
-def load_google():
-    df = pd.read_csv(
-        GOOGLEBOOKS_CSV_PATH,
-        sep=",",
-        encoding="utf-8",
-        dtype={"isbn13": "string", "isbn10": "string"},
-    )
-
-    required = [
-        "gb_id", "title", "subtitle", "authors", "publisher", "pub_date", "language",
-        "categories", "isbn13", "isbn10", "price_amount", "price_currency",
-        "goodreads_title_query", "goodreads_author_query",
-    ]
+def google_landing_files():
+    """
+    Archivos de Google Books a integrar: las partes del sink Parquet si son más recientes que
+    el CSV (o no hay CSV); si no, el CSV.
+    """
+    parts = sorted(GOOGLEBOOKS_PARQUET_DIR.glob("part-*.parquet"))
+    if parts and (not GOOGLEBOOKS_CSV_PATH.exists()
+                  or max(p.stat().st_mtime for p in parts) > GOOGLEBOOKS_CSV_PATH.stat().st_mtime):
+        return parts
+    return [GOOGLEBOOKS_CSV_PATH]
+
+
+def load_google(files=None):
+    files = files or google_landing_files()
+    if files[0].suffix == ".parquet":
+        # Las listas llegan como listas reales y price_amount como float, igual que desde memoria
+        df = google_frame(pq.read_table(files).to_pydict())
+        source = GOOGLEBOOKS_PARQUET_DIR
+    else:
+        df = pd.read_csv(
+            files[0],
+            sep=",",
+            encoding="utf-8",
+            dtype={"isbn13": "string", "isbn10": "string"},
+        )
+        df = ensure_columns(df, GOOGLE_REQUIRED, copy=False)
+        source = files[0]
 
-    df = ensure_columns(df, required)
-    logging.info(f"Cargado {GOOGLEBOOKS_CSV_PATH} ({len(df)} filas)")
+    df.attrs["source_file"] = source.name
+    logging.info(f"Cargado {source} ({len(df)} filas)")
     return df
 
 
-def standardize_sources(df_gr: pd.DataFrame, df_gb: pd.DataFrame) -> pd.DataFrame:
+GR_RENAMES = {
+    "title": "title_gr", "author": "author_gr", "isbn10": "isbn10_gr", "isbn13": "isbn13_gr",
+    "rating": "gr_rating", "ratings_count": "gr_ratings_count", "book_url": "gr_book_url",
+}
+GB_RENAMES = {
+    "title": "title_gb", "isbn10": "isbn10_gb", "isbn13": "isbn13_gb", "pub_date": "pub_date_raw",
+    "language": "lang_raw", "price_currency": "currency_raw", "price_amount": "price_amount",
+}
+
+
+def standardize_sources(df_gr: pd.DataFrame, df_gb: pd.DataFrame, copy=True) -> pd.DataFrame:
+    """
+    Une Goodreads y Google Books en el detalle por fuente.
+    Con copy=False renombra y amplía df_gr/df_gb en sitio en lugar de copiarlos.
+    """
     ts = datetime.now(UTC).isoformat()
 
     # Goodreads
-    gr = df_gr.copy()
-    gr = gr.rename(
-        columns={
-            "title": "title_gr", "author": "author_gr", "isbn10": "isbn10_gr", "isbn13": "isbn13_gr",
-            "rating": "gr_rating", "ratings_count": "gr_ratings_count", "book_url": "gr_book_url",
-        }
-    )
+    if copy:
+        gr = df_gr.rename(columns=GR_RENAMES)
+    else:
+        df_gr.rename(columns=GR_RENAMES, inplace=True)
+        gr = df_gr
     gr["source_gr"] = "goodreads"
     gr["source_file_gr"] = GOODREADS_JSON_PATH.name
     gr["ingestion_ts_gr"] = ts
 
     # Google Books
-    gb = df_gb.copy()
-    gb = gb.rename(
-        columns={
-            "title": "title_gb", "isbn10": "isbn10_gb", "isbn13": "isbn13_gb", "pub_date": "pub_date_raw",
-            "language": "lang_raw", "price_currency": "currency_raw", "price_amount": "price_amount",
-        }
-    )
+    if copy:
+        gb = df_gb.rename(columns=GB_RENAMES)
+    else:
+        df_gb.rename(columns=GB_RENAMES, inplace=True)
+        gb = df_gb
     gb["source_gb"] = "googlebooks"
-    gb["source_file_gb"] = GOOGLEBOOKS_CSV_PATH.name
+    gb["source_file_gb"] = df_gb.attrs.get("source_file", GOOGLEBOOKS_CSV_PATH.name)
     gb["ingestion_ts_gb"] = ts
 
     # Parseo de listas en Google Books
@@ -217,9 +314,19 @@ def standardize_sources(df_gr: pd.DataFrame, df_gb: pd.DataFrame) -> pd.DataFram
     )
 
     # Respaldo: merge por join_key (Outer Join)
+    # Solo se prefijan y cruzan las columnas que se usan después, no las tablas completas.
+    m_join_cols = [
+        "jk_join_key", "jk_title_gb", "jk_title_gr", "jk_author_gr", "jk_authors",
+        "jk_isbn13_gb", "jk_isbn13_gr", "jk_isbn10_gb", "jk_isbn10_gr",
+        "jk_publisher", "jk_pub_date_raw", "jk_lang_raw", "jk_currency_raw",
+        "jk_price_amount", "jk_categories", "jk_gb_id", "jk_gr_book_url",
+        "jk_gr_rating", "jk_gr_ratings_count",
+    ]
+    gb_jk = [c for c in gb.columns if f"jk_{c}" in m_join_cols]
+    gr_jk = [c for c in gr.columns if f"jk_{c}" in m_join_cols]
     m_join = pd.merge(
-        gb.add_prefix("jk_"),
-        gr.add_prefix("jk_"),
+        gb[gb_jk].add_prefix("jk_"),
+        gr[gr_jk].add_prefix("jk_"),
         how="outer",
         left_on="jk_join_key",
         right_on="jk_join_key",
@@ -230,13 +337,6 @@ def standardize_sources(df_gr: pd.DataFrame, df_gb: pd.DataFrame) -> pd.DataFram
     m_isbn["join_key"] = m_isbn.get("join_key_gb").combine_first(m_isbn.get("join_key_gr"))
 
     # Fusión final combinando ambos merges
-    m_join_cols = [
-        "jk_join_key", "jk_title_gb", "jk_title_gr", "jk_author_gr", "jk_authors",
-        "jk_isbn13_gb", "jk_isbn13_gr", "jk_isbn10_gb", "jk_isbn10_gr",
-        "jk_publisher", "jk_pub_date_raw", "jk_lang_raw", "jk_currency_raw",
-        "jk_price_amount", "jk_categories", "jk_gb_id", "jk_gr_book_url",
-        "jk_gr_rating", "jk_gr_ratings_count",
-    ]
 
     merged = pd.merge(
         m_isbn,
@@ -295,47 +395,50 @@ def apply_survival_rules(group: pd.DataFrame) -> pd.Series:
     """
     Lógica de supervivencia para elegir el Golden Record. (Se eliminó author_primary)
     """
-    group = group.copy()
-    group["__nonnulls"] = group.notna().sum(axis=1)
-    group["__has_isbn"] = group[["isbn13_gb", "isbn13_gr", "isbn10_gb", "isbn10_gr"]].notna().any(axis=1)
-    group = group.sort_values(["__has_isbn", "__nonnulls"], ascending=False)
+    # Orden de preferencia (con ISBN primero, luego más completos) sin copiar ni ampliar el grupo
+    nonnulls = group.notna().sum(axis=1).to_numpy()
+    has_isbn = group[["isbn13_gb", "isbn13_gr", "isbn10_gb", "isbn10_gr"]].notna().any(axis=1).to_numpy()
+    order = np.lexsort((-nonnulls, -has_isbn.astype(np.int8)))
+
+    def ordered(col):
+        return group[col].iloc[order] if col in group.columns else pd.Series(dtype=object)
 
     titles = (
-        [t for t in group.get("title_gb", pd.Series(dtype=object)).dropna().tolist()]
-        + [t for t in group.get("title_gr", pd.Series(dtype=object)).dropna().tolist()]
+        [t for t in ordered("title_gb").dropna().tolist()]
+        + [t for t in ordered("title_gr").dropna().tolist()]
     )
     title = max(titles, key=len) if titles else None
 
     # Lógica para combinar correctamente los autores
     all_authors = []
 
-    authors_gb_list = group.get("authors", pd.Series(dtype=object)).dropna().tolist()
+    authors_gb_list = ordered("authors").dropna().tolist()
     for item in authors_gb_list:
         if isinstance(item, list):
             all_authors.extend(item)
         elif pd.notna(item) and str(item):
-            all_authors.append(clean_string(str(item)))
+            all_authors.append(clean_label(str(item)))
 
-    author_gr_string = group.get("author_gr", pd.Series(dtype=object)).dropna().tolist()
+    author_gr_string = ordered("author_gr").dropna().tolist()
     for item in author_gr_string:
         if pd.notna(item) and str(item):
-            all_authors.append(clean_string(str(item)))
+            all_authors.append(clean_label(str(item)))
 
-    unique_authors = sorted({clean_string(a) for a in all_authors if a})
+    unique_authors = sorted({clean_label(a) for a in all_authors if a})
     author_primary = unique_authors[0] if unique_authors else None # Aún se calcula para el 'title key'
 
     # Lógica para combinar correctamente las categorías
     all_cats = []
-    cats_gb_list = group.get("categories", pd.Series(dtype=object)).dropna().tolist()
+    cats_gb_list = ordered("categories").dropna().tolist()
     for item in cats_gb_list:
         if isinstance(item, list):
             all_cats.extend(item)
         elif pd.notna(item) and str(item):
-            all_cats.append(clean_string(str(item)))
+            all_cats.append(clean_label(str(item)))
 
-    unique_categories = sorted({clean_string(c) for c in all_cats if c})
+    unique_categories = sorted({clean_label(c) for c in all_cats if c})
 
-    s = group.iloc[0]
+    s = group.iloc[order[0]]
 
     return pd.Series(
         {
@@ -361,8 +464,23 @@ def apply_survival_rules(group: pd.DataFrame) -> pd.Series:
     )
 
 
-def normalize_canonical_model(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
+def with_dictionary_lists(df: pd.DataFrame, cols=LIST_COLUMNS, copy=True) -> pd.DataFrame:
+    """
+    Pasa las columnas de listas (autores, categorías) a Arrow list<dictionary<string>>.
+    Hasta aquí (parseo, supervivencia por grupo) las listas siguen siendo listas de Python;
+    la conversión se hace una vez, en la normalización, antes de escribir.
+    """
+    if copy:
+        df = df.copy(deep=False)
+    for col in cols:
+        if col in df.columns:
+            df[col] = dictionary_list_series(df[col].to_numpy(dtype=object), index=df.index)
+    return df
+
+
+def normalize_canonical_model(df: pd.DataFrame, copy=True) -> pd.DataFrame:
+    if copy:
+        df = df.copy()
 
     df["pub_date_iso"] = df["pub_date_raw"].apply(normalize_date)
     df["pub_year"] = pd.to_datetime(df["pub_date_iso"], errors="coerce").dt.year.astype("Int64")
@@ -372,9 +490,7 @@ def normalize_canonical_model(df: pd.DataFrame) -> pd.DataFrame:
     df["title"] = df["title"].apply(clean_string)
     df["publisher"] = df["publisher"].apply(clean_string)
 
-    df["categories"] = df["categories"].apply(
-        lambda x: ", ".join(x) if isinstance(x, list) else x
-    )
+    df = with_dictionary_lists(df, copy=False)
 
     # Columna author_primary ELIMINADA de dim_cols
     dim_cols = [
@@ -384,7 +500,7 @@ def normalize_canonical_model(df: pd.DataFrame) -> pd.DataFrame:
         "gb_id", "gr_book_url", "source_winner", "ts_last_update",
     ]
 
-    df = ensure_columns(df, dim_cols)
+    df = ensure_columns(df, dim_cols, copy=False)
     return df[dim_cols]
 
 
@@ -408,65 +524,163 @@ def write_schema_md():
 - book_id: isbn13 o hash estable cuando no hay isbn13. [str]
 - title: título consolidado. [str]
 - subtitle: subtítulo. [str]
-- authors: lista unificada sin duplicados. [str]
+- authors: lista unificada sin duplicados, ordenada. [list<dictionary<string>>]
 - publisher: editorial. [str]
 - pub_date_iso: ISO-8601 (YYYY-MM-DD). [str]
 - pub_year: YYYY. [int]
 - language: BCP-47 (es, en, pt-BR, ...). [str]
 - isbn10: identificador ISBN-10. [str]
 - isbn13: identificador ISBN-13. [str]
-- categories: categorías separadas por coma. [str]
+- categories: lista de categorías sin duplicados, ordenada. [list<dictionary<string>>]
 - price_amount: decimal con punto. [float]
 - price_currency: ISO-4217 (USD, EUR, ...). [str]
 - gr_rating, gr_ratings_count: rating y nº ratings de Goodreads. [float,int]
 - gb_id: id de Google Books. [str]
 - gr_book_url: URL Goodreads. [str]
 - source_winner: googlebooks | goodreads. [str]
-- ts_last_update: ISO-8601 UTC. [str]
+- ts_last_update: ISO-8601 UTC; solo cambia cuando cambia el contenido de la fila. [str]
+
+# Cambios dim_book_changes
+
+Diferencia de cada integración respecto al dim_book anterior.
+
+- op: insert | update | delete. [str]
+- book_id: libro afectado. [str]
+- changed_columns: columnas modificadas (solo en update). [list[str]]
+- captured_at: ISO-8601 UTC de la integración. [str]
+- resto de columnas: fila nueva de dim_book (nulas en delete).
 """
     SCHEMA_MD_PATH.write_text(schema_md, encoding="utf-8")
 
 
-def integrate_pipeline():
+def transform_sources(df_gr: pd.DataFrame, df_gb: pd.DataFrame, memory_budget_mb=None, memory_report=None):
+    """
+    Une ambas fuentes, deduplica y normaliza.
+    Devuelve (detalle por fuente, dim_book) sin escribir nada a disco.
+
+    Con memory_budget_mb se ejecuta en modo sin copias (df_gr y df_gb se modifican en sitio),
+    se comprueba antes de empezar que la estimación cabe y cada etapa falla con
+    MemoryBudgetError si su pico supera el presupuesto. memory_report (dict) recibe el pico
+    en MB de cada etapa; pasarlo activa la medición aunque no haya presupuesto.
+    """
+    budgeted = memory_budget_mb is not None
+    tracked = budgeted or memory_report is not None
+    if budgeted:
+        check_estimate(frame_bytes(df_gr, df_gb) * INTEGRATION_EXPANSION_FACTOR, memory_budget_mb, "Integración")
+
+    def stage(name):
+        return track_stage(name, memory_budget_mb, memory_report) if tracked else nullcontext()
+
+    with tracing() if tracked else nullcontext():
+        with stage("standardize"):
+            df_detail = standardize_sources(df_gr, df_gb, copy=not budgeted)
+
+        with stage("survival"):
+            df_canonical = (
+                df_detail.groupby("book_id", dropna=False)
+                .apply(apply_survival_rules)
+                .reset_index(drop=True)
+            )
+        logging.info(f"Filas después de deduplicación: {len(df_canonical)}")
+
+        with stage("normalize"):
+            df_dim_book = normalize_canonical_model(df_canonical, copy=not budgeted)
+            df_detail = with_dictionary_lists(df_detail, copy=not budgeted)
+    return df_detail, df_dim_book
+
+
+def write_outputs(df_gr: pd.DataFrame, df_gb: pd.DataFrame, df_detail: pd.DataFrame, df_dim_book: pd.DataFrame,
+                  arrow_ipc=False):
+    """
+    Escribe los Parquet de standard/ y la documentación de docs/.
+    El detalle por fuente se añade al histórico (sin reescribir ejecuciones anteriores) y, si
+    alguna partición acumula archivos, se compacta en segundo plano.
+    Con arrow_ipc=True añade copias Arrow IPC para lectores que usan memory-map (utils_arrow.read_ipc_mmap).
+    Antes de sustituir dim_book se compara con el snapshot anterior: las filas sin cambios conservan
+    su ts_last_update y los cambios se guardan en dim_book_changes.parquet.
+    Devuelve dim_book tal como se ha escrito.
+    """
+    create_directories()
+
+    append_detail(df_detail, DETAIL_BOOK_PATH)
+
+    previous = pq.read_table(DIM_BOOK_PATH) if DIM_BOOK_PATH.exists() else None
+    df_dim_book, df_changes, summary = capture_changes(previous, df_dim_book)
+    write_parquet_atomic(df_changes, DIM_BOOK_CHANGES_PATH)
+    logging.info(f"Cambios en dim_book respecto al snapshot anterior: {summary}")
+
+    write_parquet_atomic(df_dim_book, DIM_BOOK_PATH)
+    logging.info(f"Guardado {DIM_BOOK_PATH} ({len(df_dim_book)} filas)")
+
+    if arrow_ipc:
+        for df, path in ((df_detail, DETAIL_BOOK_ARROW_PATH), (df_dim_book, DIM_BOOK_ARROW_PATH)):
+            write_ipc_atomic(df, path)
+            logging.info(f"Guardado {path} ({len(df)} filas)")
+
+    quality = generate_quality_metrics(df_gr, df_gb, df_dim_book)
+    with open(QUALITY_METRICS_PATH, "w", encoding="utf-8") as f:
+        json.dump(quality, f, indent=2, ensure_ascii=False)
+
+    write_schema_md()
+    start_background_compaction(DETAIL_BOOK_PATH)
+    return df_dim_book
+
+
+def integrate_pipeline(force=False, arrow_ipc=False, memory_budget_mb=None):
     logging.info("--- Iniciando Bloque 3: Integración ---")
     create_directories()
 
+    spec = stage_spec(arrow_ipc=arrow_ipc)
     try:
-        df_gr = load_goodreads()
-        df_gb = load_google()
+        run, reason, fingerprint = check_stage(STAGE_NAME, **spec, force=force)
     except FileNotFoundError as e:
         logging.error(f"Faltan archivos de landing/: {e}")
         return
-    except json.JSONDecodeError as e:
-        logging.error(f"JSON inválido en {GOODREADS_JSON_PATH}: {e}")
+    if not run:
+        logging.info(f"Integración omitida: {reason}. Usa --force para regenerar.")
         return
+    logging.info(f"Integración necesaria: {reason}")
 
-    # Bloque try/except para capturar fallos de procesamiento y logging crítico
-    try:
-        df_detail = standardize_sources(df_gr, df_gb)
-        df_detail.to_parquet(DETAIL_BOOK_PATH, index=False, engine="pyarrow")
-        logging.info(f"Guardado {DETAIL_BOOK_PATH} ({len(df_detail)} filas)")
-
-        df_canonical = (
-            df_detail.groupby("book_id", dropna=False)
-            .apply(apply_survival_rules)
-            .reset_index(drop=True)
-        )
-        logging.info(f"Filas después de deduplicación: {len(df_canonical)}")
+    # Con presupuesto de memoria: modo sin copias y pico medido por etapa
+    report = {} if memory_budget_mb is not None else None
 
-        df_dim_book = normalize_canonical_model(df_canonical)
-        df_dim_book.to_parquet(DIM_BOOK_PATH, index=False, engine="pyarrow")
-        logging.info(f"Guardado {DIM_BOOK_PATH} ({len(df_dim_book)} filas)")
-
-        quality = generate_quality_metrics(df_gr, df_gb, df_dim_book)
-        with open(QUALITY_METRICS_PATH, "w", encoding="utf-8") as f:
-            json.dump(quality, f, indent=2, ensure_ascii=False)
-
-        write_schema_md()
-        logging.info("--- Pipeline de Integración (Bloque 3) completado ---")
-    except Exception as e:
-        logging.critical(f"FALLO CRÍTICO EN PROCESAMIENTO: {type(e).__name__}: {e}")
+    def stage(name):
+        return track_stage(name, memory_budget_mb, report) if report is not None else nullcontext()
 
+    with tracing() if report is not None else nullcontext():
+        try:
+            with stage("load"):
+                df_gr = load_goodreads()
+                df_gb = load_google(spec["inputs"][1:])
+        except FileNotFoundError as e:
+            logging.error(f"Faltan archivos de landing/: {e}")
+            return
+        except json.JSONDecodeError as e:
+            logging.error(f"JSON inválido en {GOODREADS_JSON_PATH}: {e}")
+            return
+        except MemoryBudgetError as e:
+            logging.critical(f"PRESUPUESTO DE MEMORIA SUPERADO: {e}")
+            return
+
+        # Bloque try/except para capturar fallos de procesamiento y logging crítico
+        try:
+            df_detail, df_dim_book = transform_sources(df_gr, df_gb, memory_budget_mb, report)
+            with stage("write"):
+                write_outputs(df_gr, df_gb, df_detail, df_dim_book, arrow_ipc=arrow_ipc)
+            record_stage(STAGE_NAME, fingerprint, spec["outputs"])
+            if report is not None:
+                logging.info(f"Picos de memoria por etapa (MB): {report}")
+            logging.info("--- Pipeline de Integración (Bloque 3) completado ---")
+        except MemoryBudgetError as e:
+            logging.critical(f"PRESUPUESTO DE MEMORIA SUPERADO: {e}")
+        except Exception as e:
+            logging.critical(f"FALLO CRÍTICO EN PROCESAMIENTO: {type(e).__name__}: {e}")
 
 if __name__ == "__main__":
-    integrate_pipeline()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Integración y estandarización de landing/ a standard/")
+    parser.add_argument("--force", action="store_true", help="Regenera aunque las entradas no hayan cambiado")
+    parser.add_argument("--arrow-ipc", action="store_true", help="Escribe también standard/*.arrow (Arrow IPC)")
+    parser.add_argument("--memory-budget-mb", type=float, default=None,
+                        help="Modo sin copias: informa del pico por etapa y falla si se supera el presupuesto")
+    args = parser.parse_args()
+    integrate_pipeline(force=args.force, arrow_ipc=args.arrow_ipc, memory_budget_mb=args.memory_budget_mb)
\ No newline at end of file
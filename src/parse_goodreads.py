@@ -0,0 +1,306 @@
+"""
+Bloque 1: Parser rápido de páginas de resultados de Goodreads.
+Usa lxml con expresiones XPath precompiladas en lugar de BeautifulSoup + select_one.
+Mantiene el parser BeautifulSoup original como referencia para comprobar paridad.
+El scraper llama a parse_page con cada página según la descarga; parse_pages (pool de procesos)
+es el punto de entrada para quien ya tiene un lote de páginas, p. ej. páginas guardadas.
+"""
+import os
+import re
+import json
+import time
+import logging
+import argparse
+from html import escape
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+from lxml import etree, html as lxml_html
+
+# --- Configuración de Rutas ---
+ROOT_DIR = Path(__file__).resolve().parents[1]
+LANDING_DIR = ROOT_DIR / "landing"
+GOODREADS_JSON_PATH = LANDING_DIR / "goodreads_books.json"
+
+# --- Constantes ---
+BASE_URL = "https://www.goodreads.com/search"
+SITE_URL = BASE_URL.split('/search')[0]
+
+# Selectores CSS (ruta BeautifulSoup de referencia)
+BOOK_CONTAINER = "tr[itemtype='http://schema.org/Book']"
+TITLE_SEL = "a.bookTitle span[itemprop='name']"
+AUTHOR_SEL = "a.authorName span[itemprop='name']"
+RATING_SEL = "span.minirating"
+URL_SEL = "a.bookTitle"
+
+# Equivalentes XPath precompilados (ruta lxml)
+def _has_class(name):
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+BOOK_CONTAINER_XP = etree.XPath("//tr[@itemtype='http://schema.org/Book']")
+TITLE_XP = etree.XPath(f".//a[{_has_class('bookTitle')}]//span[@itemprop='name']")
+AUTHOR_XP = etree.XPath(f".//a[{_has_class('authorName')}]//span[@itemprop='name']")
+RATING_XP = etree.XPath(f".//span[{_has_class('minirating')}]")
+URL_XP = etree.XPath(f".//a[{_has_class('bookTitle')}]")
+
+# "4.13 avg rating — 2,625 ratings", también "avg rating 4.13 · 2,625 ratings" u otro separador
+RATING_RE = re.compile(
+    r"(?:(\d+(?:\.\d+)?)\s*avg rating|avg rating\s*(\d+(?:\.\d+)?))\D*?(\d[\d,]*)\s*ratings?\b"
+)
+# Textos de rating en los que parse_rating da lo mismo que el parser original; van a la página de paridad
+RATING_TEXT_VARIANTS = [
+    "avg rating 4.1 — 3 ratings",
+    "4.10 avg rating—1,234 ratings",
+    "  3.9   avg rating   —   10 ratings  ",
+    "5 avg rating — 1 rating",
+    "0.00 avg rating — 0 ratings — published 2021",
+    "no ratings yet",
+]
+# Textos que el parser original rechazaba ((None, None)) y parse_rating sí lee: texto antes de
+# la media o un separador distinto de la raya. Son los únicos casos en los que difieren.
+RATING_TEXT_WIDENED = {
+    "really liked it 4.00 avg rating — 5 ratings": (4.0, 5),
+    "4.1 avg rating - 3 ratings": (4.1, 3),
+    "4.25 avg rating · 1,024 ratings": (4.25, 1024),
+    "it was amazing 4.5 avg rating | 7 ratings": (4.5, 7),
+}
+
+# Por debajo de este número de páginas no compensa arrancar procesos
+POOL_MIN_PAGES = 8
+
+
+def parse_rating(text):
+    """Extrae (media, nº de ratings) del texto de 'minirating'. Devuelve (None, None) si no encaja."""
+    m = RATING_RE.search(text) if text else None
+    if not m:
+        return None, None
+    return float(m.group(1) or m.group(2)), int(m.group(3).replace(',', ''))
+
+
+def _text(el):
+    return "".join(el.itertext()).strip()
+
+
+def parse_item(item):
+    """Convierte un <tr> de resultado en el dict de libro que guarda el scraper."""
+    t_els = TITLE_XP(item)
+    title = _text(t_els[0]) if t_els else "Unknown"
+
+    a_els = AUTHOR_XP(item)
+    u_els = URL_XP(item)
+    r_els = RATING_XP(item)
+
+    r_txt = _text(r_els[0]) if r_els else None
+    rate, count = parse_rating(r_txt) if r_txt else (None, None)
+
+    href = u_els[0].get('href') if u_els else None
+    b_url = (SITE_URL + href) if href is not None else None
+
+    return {
+        "title": title,
+        "author": _text(a_els[0]) if a_els else None,
+        "rating": rate,
+        "ratings_count": count,
+        "book_url": b_url,
+        "isbn10": None, # Clave inicializada para el Enriquecimiento (Bloque 2)
+        "isbn13": None  # Clave inicializada para el Enriquecimiento (Bloque 2)
+    }
+
+
+def parse_page(page_source):
+    """Parsea una página de resultados y devuelve la lista de libros en orden de aparición."""
+    if not page_source:
+        return []
+    root = lxml_html.fromstring(page_source)
+    books = []
+    for item in BOOK_CONTAINER_XP(root):
+        try:
+            books.append(parse_item(item))
+        except Exception as e:
+            logging.debug(f"Item descartado: {e}")
+    return books
+
+
+def parse_pages(pages, workers=None):
+    """
+    Parsea varias páginas. Con muchas páginas y más de un núcleo usa un pool de procesos
+    para que el parseo no sea el cuello de botella del scraping concurrente.
+    """
+    pages = list(pages)
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(pages) < POOL_MIN_PAGES:
+        return [parse_page(p) for p in pages]
+    workers = min(workers, len(pages))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(parse_page, pages, chunksize=max(1, len(pages) // (workers * 4))))
+
+
+# --- Ruta de referencia (BeautifulSoup) ---
+
+def parse_rating_bs4(text):
+    """Implementación original de parse_rating, usada solo como referencia."""
+    try:
+        parts = text.split('—')
+        avg = float(parts[0].replace('avg rating', '').strip())
+        count = int(parts[1].replace('ratings', '').replace('rating', '').replace(',', '').strip())
+        return avg, count
+    except (IndexError, ValueError):
+        return None, None
+
+
+def parse_page_bs4(page_source):
+    """Parser original con BeautifulSoup + select_one. Se mantiene para el test de paridad."""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(page_source, 'lxml')
+    books = []
+    for item in soup.select(BOOK_CONTAINER):
+        try:
+            t_el = item.select_one(TITLE_SEL)
+            title = t_el.text.strip() if t_el else "Unknown"
+
+            a_el = item.select_one(AUTHOR_SEL)
+            u_el = item.select_one(URL_SEL)
+            r_el = item.select_one(RATING_SEL)
+
+            r_txt = r_el.text.strip() if r_el else None
+            rate, count = parse_rating_bs4(r_txt) if r_txt else (None, None)
+
+            b_url = (SITE_URL + u_el['href']) if u_el and u_el.has_attr('href') else None
+
+            books.append({
+                "title": title,
+                "author": a_el.text.strip() if a_el else None,
+                "rating": rate,
+                "ratings_count": count,
+                "book_url": b_url,
+                "isbn10": None,
+                "isbn13": None
+            })
+        except Exception:
+            pass
+    return books
+
+
+# --- Fixture y benchmark ---
+
+def build_fixture_page(books, rating_variants=RATING_TEXT_VARIANTS):
+    """
+    Genera una página con el marcado de resultados de Goodreads a partir de registros ya scrapeados,
+    más una fila por cada texto de `rating_variants` para cubrir los formatos de rating raros.
+    """
+    variants = [{"title": f"Rating variant {i}", "author": "Fixture", "rating_text": text,
+                 "book_url": f"{SITE_URL}/book/show/variant-{i}"} for i, text in enumerate(rating_variants)]
+    rows = []
+    for b in list(books) + variants:
+        href = (b.get("book_url") or "").replace(SITE_URL, "")
+        if "rating_text" in b:
+            rating = escape(b["rating_text"])
+        elif b.get("rating") is not None:
+            rating = f"{b['rating']:.2f} avg rating &mdash; {b.get('ratings_count') or 0:,} ratings"
+        else:
+            rating = ""
+        rows.append(f"""
+<tr itemscope itemtype="http://schema.org/Book">
+  <td width="5%" valign="top"><div id="{escape(href)}" class="u-anchorTarget"></div>
+    <a title="{escape(b.get('title') or '')}" href="{escape(href)}"><img alt="cover" class="bookCover" itemprop="image" src="x.jpg" /></a>
+  </td>
+  <td width="100%" valign="top">
+    <a class="bookTitle" itemprop="url" href="{escape(href)}">
+      <span itemprop='name' role='heading' aria-level='4'>{escape(b.get('title') or '')}</span>
+    </a>
+    <br/>
+    <span class='by'>by</span>
+    <span itemprop='author' itemscope='' itemtype='http://schema.org/Person'>
+      <div class='authorName__container'>
+        <a class="authorName" itemprop="url" href="/author/show/1"><span itemprop="name">{escape(b.get('author') or '')}</span></a>
+      </div>
+    </span>
+    <div><span class="greyText smallText uitext">
+      <span class="minirating"><span class="stars staticStars notranslate"><span class="staticStar p10" size="12x12"></span></span> {rating}</span>
+      &mdash; published 2013 &mdash; 12 editions
+    </span></div>
+  </td>
+</tr>""")
+    return (
+        "<html><head><title>Search results</title></head><body><table class='tableList'>"
+        + "".join(rows)
+        + "</table><a class='next_page' href='/search?page=2'>next »</a></body></html>"
+    )
+
+
+def load_fixture_books(path=GOODREADS_JSON_PATH):
+    with open(path, 'r', encoding='utf-8') as f:
+        payload = json.load(f)
+    return payload["books"] if isinstance(payload, dict) and "books" in payload else payload
+
+
+def check_parity(page_source):
+    """
+    Devuelve True si la ruta lxml produce exactamente los mismos registros que la de BeautifulSoup
+    y parse_rating coincide con el parser original en todos los RATING_TEXT_VARIANTS.
+    """
+    if any(parse_rating(t) != parse_rating_bs4(t) for t in RATING_TEXT_VARIANTS):
+        return False
+    return parse_page(page_source) == parse_page_bs4(page_source)
+
+
+def check_widened_ratings():
+    """
+    Textos de RATING_TEXT_WIDENED en los que parse_rating no da el valor esperado o el parser
+    original no los rechaza (entonces ya no serían una diferencia). Lista vacía = todo bien.
+    """
+    return [text for text, expected in RATING_TEXT_WIDENED.items()
+            if parse_rating(text) != expected or parse_rating_bs4(text) != (None, None)]
+
+
+def benchmark(page_source, repeat=50, pages=64, workers=None):
+    """Mide el parseo por página de ambas rutas y el rendimiento con pool sobre 'pages' páginas."""
+    if not check_parity(page_source):
+        raise AssertionError("El parser lxml no coincide con la ruta BeautifulSoup de referencia")
+    widened = check_widened_ratings()
+    if widened:
+        raise AssertionError(f"parse_rating no lee como se espera los textos ampliados: {widened}")
+
+    def per_page(fn):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn(page_source)
+        return (time.perf_counter() - start) / repeat
+
+    t_bs4 = per_page(parse_page_bs4)
+    t_lxml = per_page(parse_page)
+
+    batch = [page_source] * pages
+    start = time.perf_counter()
+    parse_pages(batch, workers=1)
+    t_serial = time.perf_counter() - start
+    start = time.perf_counter()
+    parse_pages(batch, workers=workers)
+    t_pool = time.perf_counter() - start
+
+    return {
+        "books_per_page": len(parse_page(page_source)),
+        "bs4_ms_per_page": round(t_bs4 * 1000, 3),
+        "lxml_ms_per_page": round(t_lxml * 1000, 3),
+        "speedup": round(t_bs4 / t_lxml, 2) if t_lxml else None,
+        "pages": pages,
+        "serial_pages_per_s": round(pages / t_serial, 1) if t_serial else None,
+        "pool_pages_per_s": round(pages / t_pool, 1) if t_pool else None,
+    }
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Paridad y benchmark del parser de resultados de Goodreads")
+    parser.add_argument("--html", type=Path, help="Página guardada (por defecto se genera desde landing/goodreads_books.json)")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--pages", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    source = args.html.read_text(encoding='utf-8') if args.html else build_fixture_page(load_fixture_books())
+    results = benchmark(source, repeat=args.repeat, pages=args.pages, workers=args.workers)
+    logging.info(f"Paridad OK con la ruta BeautifulSoup; {len(RATING_TEXT_WIDENED)} textos de rating "
+                 f"que el parser original rechazaba se leen como se espera")
+    print(json.dumps(results, indent=2))
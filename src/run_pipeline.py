@@ -0,0 +1,202 @@
+"""
+Orquestador: Scraping -> Enriquecimiento -> Integración en un solo proceso.
+Las etapas se conectan con colas acotadas: el enriquecimiento arranca con el primer libro
+scrapeado y la integración va consumiendo registros por lotes. Los archivos de landing/
+se siguen escribiendo como salidas laterales para auditoría.
+"""
+import sys
+import queue
+import logging
+import argparse
+import threading
+from pathlib import Path
+
+import pandas as pd
+import requests
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT_DIR / "src"))
+
+from scrape_goodreads import iter_goodreads_books, save_goodreads_books, SEARCH_TERM, TARGET_COUNT
+import enrich_googlebooks
+import integrate_pipeline
+from build_cache import stage_fingerprint, record_stage
+from enrich_googlebooks import enrich_book, save_google_books
+from integrate_pipeline import goodreads_frame, google_frame, transform_sources, write_outputs
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# --- Configuración ---
+ENRICH_WORKERS = 4
+QUEUE_SIZE = 64
+BATCH_SIZE = 32
+POLL_SECONDS = 0.5
+
+# Marca de fin de flujo de cada productor
+_DONE = object()
+
+
+def _put(q, item, stop):
+    """put() bloqueante que se rinde si otra etapa ha pedido parar."""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=POLL_SECONDS)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _scrape_stage(books_q, records_q, stop, search_term, target_count, n_workers, errors):
+    scraped = []
+    books = iter_goodreads_books(search_term, target_count)
+    try:
+        for seq, book in enumerate(books):
+            scraped.append(book)
+            if not (_put(books_q, (seq, book), stop) and _put(records_q, ("goodreads", seq, book), stop)):
+                break
+        if not stop.is_set():
+            save_goodreads_books(scraped)
+    except Exception as e:
+        errors.append(e)
+        stop.set()
+    finally:
+        books.close()
+        for _ in range(n_workers):
+            _put(books_q, _DONE, stop)
+        _put(records_q, _DONE, stop)
+
+
+def _enrich_stage(books_q, records_q, stop, errors):
+    try:
+        with requests.Session() as session:
+            while not stop.is_set():
+                try:
+                    item = books_q.get(timeout=POLL_SECONDS)
+                except queue.Empty:
+                    continue
+                if item is _DONE:
+                    break
+                seq, book = item
+                parsed = enrich_book(book, session)
+                if parsed is not None and not _put(records_q, ("googlebooks", seq, parsed), stop):
+                    break
+    except Exception as e:
+        errors.append(e)
+        stop.set()
+    finally:
+        _put(records_q, _DONE, stop)
+
+
+def _flush(source, batch, frames, records):
+    """Convierte un lote de registros de una fuente en DataFrame."""
+    if not batch:
+        return
+    batch.sort(key=lambda x: x[0])
+    records.extend(batch)
+    rows = [rec for _, rec in batch]
+    frame = goodreads_frame(rows) if source == "goodreads" else google_frame(rows)
+    frame.index = [seq for seq, _ in batch]
+    frames.append(frame)
+    batch.clear()
+
+
+def run_pipeline(search_term=SEARCH_TERM, target_count=TARGET_COUNT, enrich_workers=ENRICH_WORKERS,
+                 queue_size=QUEUE_SIZE, batch_size=BATCH_SIZE, arrow_ipc=False):
+    """
+    Ejecuta las tres etapas en paralelo. Devuelve (df_detail, df_dim_book) o None si falla.
+    """
+    logging.info(f"--- Pipeline en streaming: '{search_term}' ({enrich_workers} workers de enriquecimiento) ---")
+    books_q = queue.Queue(maxsize=queue_size)
+    records_q = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    errors = []
+
+    threads = [threading.Thread(
+        target=_scrape_stage, name="scrape",
+        args=(books_q, records_q, stop, search_term, target_count, enrich_workers, errors),
+    )]
+    threads += [
+        threading.Thread(target=_enrich_stage, name=f"enrich-{i}", args=(books_q, records_q, stop, errors))
+        for i in range(enrich_workers)
+    ]
+    for t in threads:
+        t.start()
+
+    # Integración: consume registros en el hilo principal y los materializa por lotes
+    frames = {"goodreads": [], "googlebooks": []}
+    batches = {"goodreads": [], "googlebooks": []}
+    records = {"goodreads": [], "googlebooks": []}
+    pending = 1 + enrich_workers
+    try:
+        while pending:
+            try:
+                item = records_q.get(timeout=POLL_SECONDS)
+            except queue.Empty:
+                if stop.is_set():
+                    break
+                continue
+            if item is _DONE:
+                pending -= 1
+                continue
+            source, seq, record = item
+            batches[source].append((seq, record))
+            if len(batches[source]) >= batch_size:
+                _flush(source, batches[source], frames[source], records[source])
+        for source in batches:
+            _flush(source, batches[source], frames[source], records[source])
+    except BaseException:
+        stop.set()
+        raise
+    finally:
+        for t in threads:
+            t.join()
+
+    if errors:
+        logging.critical(f"FALLO EN ETAPA: {type(errors[0]).__name__}: {errors[0]}")
+        return None
+
+    # Salida lateral de landing/ en el mismo orden que el enriquecimiento secuencial
+    gb_records = sorted(records["googlebooks"], key=lambda x: x[0])
+    gb_saved = save_google_books([rec for _, rec in gb_records])
+
+    gr_frames, gb_frames = frames["goodreads"], frames["googlebooks"]
+    if not gr_frames:
+        logging.warning("No hay datos de Goodreads; no se integra nada.")
+        return None
+    df_gr = pd.concat(gr_frames).sort_index().reset_index(drop=True)
+    df_gb = (pd.concat(gb_frames).sort_index().reset_index(drop=True)
+             if gb_frames else google_frame([]))
+
+    try:
+        df_detail, df_dim_book = transform_sources(df_gr, df_gb)
+        df_dim_book = write_outputs(df_gr, df_gb, df_detail, df_dim_book, arrow_ipc=arrow_ipc)
+    except Exception as e:
+        logging.critical(f"FALLO CRÍTICO EN PROCESAMIENTO: {type(e).__name__}: {e}")
+        return None
+
+    # Las salidas ya corresponden a los landing/ recién escritos: lo registramos en la caché
+    # para que una ejecución posterior de cada etapa por separado pueda omitirse.
+    if gb_saved:
+        specs = [
+            (enrich_googlebooks.STAGE_NAME, enrich_googlebooks.stage_spec()),
+            (integrate_pipeline.STAGE_NAME, integrate_pipeline.stage_spec(arrow_ipc=arrow_ipc)),
+        ]
+        for stage, spec in specs:
+            fingerprint = stage_fingerprint(spec["inputs"], spec["code"], spec["params"])
+            record_stage(stage, fingerprint, spec["outputs"])
+
+    logging.info("--- Pipeline en streaming completado ---")
+    return df_detail, df_dim_book
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scraping, enriquecimiento e integración encadenados con colas")
+    parser.add_argument("--query", default=SEARCH_TERM)
+    parser.add_argument("--target", type=int, default=TARGET_COUNT)
+    parser.add_argument("--workers", type=int, default=ENRICH_WORKERS)
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--arrow-ipc", action="store_true", help="Escribe también standard/*.arrow (Arrow IPC)")
+    args = parser.parse_args()
+    run_pipeline(args.query, args.target, args.workers, args.queue_size, args.batch_size, args.arrow_ipc)
@@ -8,21 +8,17 @@ import logging
 from datetime import datetime, UTC
 from pathlib import Path
 
-# Selenium
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
+# Selenium y webdriver_manager se importan dentro de las funciones que los usan:
+# son lo más caro de cargar y no hacen falta para importar este módulo.
 
 # Parsing
-from bs4 import BeautifulSoup
+from parse_goodreads import parse_page
 
 # --- Configuración de Rutas ---
 ROOT_DIR = Path(__file__).resolve().parents[1]
 LANDING_DIR = ROOT_DIR / "landing"
 GOODREADS_JSON_PATH = LANDING_DIR / "goodreads_books.json"
+DRIVER_CACHE_PATH = ROOT_DIR / ".cache" / "chromedriver.json"
 
 def create_directories():
     LANDING_DIR.mkdir(parents=True, exist_ok=True)
@@ -33,14 +29,12 @@ SEARCH_TERM = "data science"
 BASE_URL = "https://www.goodreads.com/search"
 SEARCH_URL = f"{BASE_URL}?q={SEARCH_TERM}"
 TARGET_COUNT = 15
+# Ruta del chromedriver resuelta por webdriver_manager; se revalida pasado este tiempo
+DRIVER_CACHE_TTL_S = 7 * 24 * 3600
 USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
 
-# Selectores
+# Selectores (los de cada libro viven en parse_goodreads.py)
 BOOK_CONTAINER = "tr[itemtype='http://schema.org/Book']"
-TITLE_SEL = "a.bookTitle span[itemprop='name']"
-AUTHOR_SEL = "a.authorName span[itemprop='name']"
-RATING_SEL = "span.minirating"
-URL_SEL = "a.bookTitle"
 NEXT_PAGE_SEL = "a.next_page"
 # Selectores para el botón "X" del popup de tu captura (se usarán en close_signin_popup)
 POPUP_CLOSE_SELECTORS = [
@@ -50,28 +44,50 @@ POPUP_CLOSE_SELECTORS = [
     "img[alt='Dismiss']"
 ]
 
+def resolve_chromedriver(refresh=False):
+    """
+    Devuelve la ruta del chromedriver. Reutiliza la resolución guardada en .cache/
+    mientras el binario exista y no haya caducado; si no, la pide a webdriver_manager.
+    """
+    if not refresh:
+        try:
+            with open(DRIVER_CACHE_PATH, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+            if Path(cached["path"]).exists() and time.time() - cached["resolved_at"] < DRIVER_CACHE_TTL_S:
+                return cached["path"]
+        except (FileNotFoundError, json.JSONDecodeError, KeyError, TypeError):
+            pass
+
+    from webdriver_manager.chrome import ChromeDriverManager
+
+    path = ChromeDriverManager().install()
+    DRIVER_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    with open(DRIVER_CACHE_PATH, 'w', encoding='utf-8') as f:
+        json.dump({"path": path, "resolved_at": time.time()}, f)
+    logging.info(f"chromedriver resuelto: {path}")
+    return path
+
 def setup_driver():
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service
+
     options = webdriver.ChromeOptions()
     options.add_argument(f"user-agent={USER_AGENT}")
     options.add_argument("--disable-gpu")
     options.add_argument("--window-size=1920x1080")
     options.add_argument("--no-sandbox")
     options.add_argument("--disable-blink-features=AutomationControlled")
-    service = Service(ChromeDriverManager().install())
-    return webdriver.Chrome(service=service, options=options)
-
-def parse_rating(text):
     try:
-        parts = text.split('—')
-        avg = float(parts[0].replace('avg rating', '').strip())
-        # Eliminamos comas para convertir el conteo
-        count = int(parts[1].replace('ratings', '').replace('rating', '').replace(',', '').strip())
-        return avg, count
-    except:
-        return None, None
+        return webdriver.Chrome(service=Service(resolve_chromedriver()), options=options)
+    except Exception as e:
+        # La ruta en caché puede apuntar a un driver incompatible tras actualizar Chrome
+        logging.warning(f"Fallo al arrancar con el chromedriver en caché ({e}). Resolviendo de nuevo...")
+        return webdriver.Chrome(service=Service(resolve_chromedriver(refresh=True)), options=options)
 
 def close_signin_popup(driver):
     """Intenta encontrar y cerrar el popup de registro si aparece."""
+    from selenium.webdriver.common.by import By
+
     for selector in POPUP_CLOSE_SELECTORS:
         try:
             # Buscamos el botón de cerrar con un timeout muy corto (1 seg)
@@ -86,16 +102,24 @@ def close_signin_popup(driver):
             continue # Prurba el siguiente selector
     return False
 
-def scrape_goodreads():
-    logging.info(f"Iniciando scraping: '{SEARCH_TERM}' -> Meta: {TARGET_COUNT}")
+def iter_goodreads_books(search_term=SEARCH_TERM, target_count=TARGET_COUNT):
+    """
+    Recorre las páginas de resultados y va entregando cada libro nuevo en cuanto se parsea,
+    para que las etapas siguientes puedan empezar sin esperar al final del scraping.
+    """
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+
+    logging.info(f"Iniciando scraping: '{search_term}' -> Meta: {target_count}")
     driver = setup_driver()
-    books_data = []
+    seen_titles = set()
 
     try:
-        driver.get(SEARCH_URL)
+        driver.get(f"{BASE_URL}?q={search_term}")
         logging.info("Web cargada.")
 
-        while len(books_data) < TARGET_COUNT:
+        while len(seen_titles) < target_count:
             
             # 1. Esperar carga de libros
             try:
@@ -104,49 +128,25 @@ def scrape_goodreads():
                 logging.warning("No se cargaron libros.")
                 break
 
-            # 2. Extraer datos (BeautifulSoup)
-            soup = BeautifulSoup(driver.page_source, 'lxml')
-            items = soup.select(BOOK_CONTAINER)
-            
-            if not items: break
+            # 2. Extraer datos (lxml con XPath precompilado)
+            page_books = parse_page(driver.page_source)
 
-            logging.info(f"Pagina leída. Procesando {len(items)} libros...")
+            if not page_books: break
 
-            for item in items:
-                if len(books_data) >= TARGET_COUNT: break
-                
-                try:
-                    t_el = item.select_one(TITLE_SEL)
-                    title = t_el.text.strip() if t_el else "Unknown"
-                    
-                    # Evitar duplicados
-                    if any(b['title'] == title for b in books_data): continue
-
-                    a_el = item.select_one(AUTHOR_SEL)
-                    u_el = item.select_one(URL_SEL)
-                    r_el = item.select_one(RATING_SEL)
-                    
-                    r_txt = r_el.text.strip() if r_el else None
-                    rate, count = parse_rating(r_txt) if r_txt else (None, None)
-                    
-                    # Se utiliza el split para asegurar la URL base
-                    b_url = (BASE_URL.split('/search')[0] + u_el['href']) if u_el and u_el.has_attr('href') else None
-
-                    books_data.append({
-                        "title": title,
-                        "author": a_el.text.strip() if a_el else None,
-                        "rating": rate,
-                        "ratings_count": count,
-                        "book_url": b_url,
-                        "isbn10": None, # Clave inicializada para el Enriquecimiento (Bloque 2)
-                        "isbn13": None  # Clave inicializada para el Enriquecimiento (Bloque 2)
-                    })
-                    logging.info(f"[{len(books_data)}/{TARGET_COUNT}] + {title}")
-                except Exception:
-                    pass
+            logging.info(f"Pagina leída. Procesando {len(page_books)} libros...")
+
+            for book in page_books:
+                if len(seen_titles) >= target_count: break
+
+                # Evitar duplicados
+                if book['title'] in seen_titles: continue
+
+                seen_titles.add(book['title'])
+                logging.info(f"[{len(seen_titles)}/{target_count}] + {book['title']}")
+                yield book
 
             # 3. Paginación
-            if len(books_data) >= TARGET_COUNT:
+            if len(seen_titles) >= target_count:
                 logging.info("¡Meta alcanzada!")
                 break
 
@@ -179,7 +179,8 @@ def scrape_goodreads():
     finally:
         driver.quit()
 
-    # --- GUARDAR SOLO LA LISTA 'BOOKS' ---
+def save_goodreads_books(books_data):
+    """Guarda la lista de libros en landing/goodreads_books.json."""
     create_directories()
     if books_data:
         # Guardamos la lista de diccionarios directamente (sin la clave 'metadata')
@@ -191,5 +192,8 @@ def scrape_goodreads():
     else:
         logging.warning("No hay datos.")
 
+def scrape_goodreads():
+    save_goodreads_books(list(iter_goodreads_books()))
+
 if __name__ == "__main__":
-    scrape_goodreads()
\ No newline at end of file
+    scrape_goodreads()
@@ -0,0 +1,132 @@
+"""
+Bloque 3: Utilidades Arrow (Parquet, IPC / Feather v2 y columnas de listas con diccionario)
+Exporta las tablas estándar a archivos Arrow sin comprimir y las lee con memory-map,
+de modo que varios procesos lectores comparten los mismos buffers de la caché de páginas.
+pandas solo se importa en las funciones que lo usan: book_lookup y los lectores Arrow no lo cargan.
+"""
+import os
+import json
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+IPC_SUFFIXES = {".arrow", ".feather", ".ipc"}
+# Listas de textos muy repetidos (autores, categorías): un diccionario por columna e índices por elemento
+DICT_LIST_TYPE = pa.list_(pa.dictionary(pa.int32(), pa.string()))
+
+
+def _as_text_list(value):
+    """Un valor suelto (p. ej. literal_eval("123") -> 123) pasa a ser una lista de un texto."""
+    if value is None or isinstance(value, (list, tuple)):
+        return value
+    # NaN, pd.NA y NaT son nulos, sin importar pandas para reconocerlos
+    if (isinstance(value, float) and value != value) or type(value).__name__ in ("NAType", "NaTType"):
+        return None
+    if hasattr(value, "tolist") and getattr(value, "ndim", 0):
+        return value.tolist()
+    return [str(value)]
+
+
+def dictionary_list_array(values) -> pa.ListArray:
+    """
+    Convierte listas de textos (Python, nulos de pandas o un array Arrow) a list<dictionary<string>>.
+    Los valores sueltos que no son listas se guardan como una lista de un elemento.
+    Cada texto distinto se guarda una sola vez para toda la columna.
+    """
+    if isinstance(values, pa.ChunkedArray):
+        values = values.combine_chunks()
+    if not isinstance(values, pa.Array):
+        values = pa.array([_as_text_list(v) for v in values], type=pa.list_(pa.string()), from_pandas=True)
+    if values.type == DICT_LIST_TYPE:
+        return values
+    values = pc.cast(values, pa.list_(pa.string()))
+    # Offsets rebasados a 0 para que también funcione con arrays recortados (slice)
+    offsets = values.offsets
+    start, end = offsets[0].as_py(), offsets[-1].as_py()
+    return pa.ListArray.from_arrays(
+        pc.subtract(offsets, offsets[0]),
+        pc.dictionary_encode(values.values.slice(start, end - start)),
+        mask=values.is_null(),
+    )
+
+
+def encode_list_columns(table: pa.Table) -> pa.Table:
+    """Convierte las columnas list<string> de la tabla a list<dictionary<string>> (p. ej. archivos antiguos)."""
+    for i, field in enumerate(table.schema):
+        if field.type in (pa.list_(pa.string()), pa.large_list(pa.string())):
+            table = table.set_column(i, field.name, dictionary_list_array(table.column(i)))
+    return table
+
+
+def dictionary_list_series(values, index=None):
+    """Serie de pandas respaldada por Arrow (ArrowDtype) con tipo list<dictionary<string>>."""
+    import pandas as pd
+
+    return pd.Series(pd.arrays.ArrowExtensionArray(dictionary_list_array(values)), index=index)
+
+
+def table_from_frame(df) -> pa.Table:
+    """
+    pa.Table desde pandas conservando los tipos Arrow de las columnas ArrowDtype.
+    pandas no sabe reconstruir algunos de esos tipos desde los metadatos (p. ej. listas de
+    diccionario), así que esas columnas se anotan como object: pd.read_parquet las devuelve como
+    arrays de numpy y los lectores Arrow siguen viendo el tipo original.
+    """
+    import pandas as pd
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if not table.schema.metadata or b"pandas" not in table.schema.metadata:
+        return table
+    meta = json.loads(table.schema.metadata[b"pandas"])
+    for col in meta["columns"]:
+        numpy_type = col.get("numpy_type") or ""
+        if numpy_type.endswith("[pyarrow]"):
+            try:
+                pd.api.types.pandas_dtype(numpy_type)
+            except (TypeError, ValueError):
+                col["numpy_type"] = "object"
+    return table.replace_schema_metadata({**table.schema.metadata, b"pandas": json.dumps(meta).encode()})
+
+
+def write_parquet_atomic(data, path):
+    """
+    Escribe un DataFrame o pa.Table como Parquet a un temporal y lo renombra: los lectores
+    (p. ej. book_lookup) ven siempre el archivo anterior o el nuevo completo, nunca uno a medio escribir.
+    """
+    path = Path(path)
+    table = data if isinstance(data, pa.Table) else table_from_frame(data)
+    tmp = path.with_name(path.name + ".tmp")
+    pq.write_table(table, tmp)
+    os.replace(tmp, path)
+    return table.num_rows
+
+
+def write_ipc_atomic(data, path):
+    """
+    Escribe un DataFrame o pa.Table como Arrow IPC sin comprimir (requisito para leerlo sin copias).
+    Se escribe a un temporal y se renombra: los lectores que ya tienen el archivo mapeado
+    conservan la versión anterior y los nuevos abren la completa.
+    """
+    path = Path(path)
+    table = data if isinstance(data, pa.Table) else table_from_frame(data)
+    tmp = path.with_name(path.name + ".tmp")
+    with pa.OSFile(str(tmp), "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp, path)
+    return table.num_rows
+
+
+def read_ipc_mmap(path) -> pa.Table:
+    """Abre un archivo Arrow IPC con memory-map: las columnas apuntan al archivo, sin decodificar ni copiar."""
+    with pa.memory_map(str(path), "r") as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def read_table(path) -> pa.Table:
+    """Lee una tabla estándar: Arrow IPC con memory-map según la extensión, si no Parquet."""
+    if Path(path).suffix in IPC_SUFFIXES:
+        return read_ipc_mmap(path)
+    return pq.read_table(path)
@@ -0,0 +1,122 @@
+"""
+Bloque 3: Captura de cambios (CDC) entre snapshots de dim_book
+Compara la tabla nueva con el snapshot anterior mediante hashes de contenido por fila y por
+columna (calculados columna a columna sobre Arrow, sin bucles por fila) y genera el conjunto
+de cambios: altas, modificaciones (con las columnas cambiadas) y bajas.
+"""
+from datetime import datetime, UTC
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+CDC_KEY = "book_id"
+# Columnas que no cuentan como cambio de contenido
+CDC_EXCLUDE = ("ts_last_update",)
+NULL_SENTINEL = "\x00"
+LIST_SEPARATOR = "\x1f"
+
+OP_INSERT = "insert"
+OP_UPDATE = "update"
+OP_DELETE = "delete"
+
+
+def column_hash(arr) -> np.ndarray:
+    """
+    Hash uint64 por fila de una columna Arrow. Todo se lleva a texto con Arrow (las listas se
+    unen con un separador) para que una misma fila dé el mismo hash venga de pandas o de Parquet.
+    """
+    if isinstance(arr, pa.ChunkedArray):
+        arr = arr.combine_chunks()
+    if pa.types.is_list(arr.type) or pa.types.is_large_list(arr.type):
+        arr = pc.binary_join(pc.cast(arr, pa.list_(pa.string())), LIST_SEPARATOR)
+    elif not pa.types.is_string(arr.type):
+        arr = pc.cast(arr, pa.string())
+    values = pc.fill_null(arr, NULL_SENTINEL).to_numpy(zero_copy_only=False)
+    return pd.util.hash_array(values, categorize=False)
+
+
+def hash_matrix(table: pa.Table, columns) -> np.ndarray:
+    """Matriz (filas x columnas) de hashes; una columna ausente se marca con un valor fijo."""
+    out = np.empty((table.num_rows, len(columns)), dtype=np.uint64)
+    for j, col in enumerate(columns):
+        if col in table.column_names:
+            out[:, j] = column_hash(table.column(col))
+        else:
+            out[:, j] = np.uint64(0)
+    return out
+
+
+def capture_changes(previous: pa.Table | None, current: pd.DataFrame, key=CDC_KEY, exclude=CDC_EXCLUDE):
+    """
+    Compara `current` con el snapshot `previous` (None si no hay).
+    Devuelve (current con ts_last_update conservado en las filas sin cambios, DataFrame de cambios, resumen).
+    El DataFrame de cambios tiene op, la clave, changed_columns (solo en updates), captured_at y
+    el contenido nuevo de la fila (nulo en las bajas).
+    """
+    captured_at = datetime.now(UTC).isoformat()
+    current = current.reset_index(drop=True)
+    cur_table = pa.Table.from_pandas(current, preserve_index=False)
+    columns = [c for c in current.columns if c != key and c not in exclude]
+
+    if previous is not None and previous.num_rows == 0:
+        previous = None
+
+    cur_keys = pd.Index(current[key].astype(str))
+    if previous is None:
+        prev_keys = pd.Index([], dtype=object)
+    else:
+        prev_keys = pd.Index(pd.Series(previous.column(key).to_pylist(), dtype=object).astype(str))
+        columns += [c for c in previous.column_names if c != key and c not in exclude and c not in columns]
+    if not cur_keys.is_unique or not prev_keys.is_unique:
+        raise ValueError(f"La clave {key} debe ser única en ambos snapshots para calcular los cambios")
+
+    pos = prev_keys.get_indexer(cur_keys)
+    common = pos >= 0
+
+    changed_cols = np.zeros((len(current), len(columns)), dtype=bool)
+    if common.any():
+        cur_h = hash_matrix(cur_table, columns)
+        prev_h = hash_matrix(previous, columns)
+        # Una columna que solo existe en un lado cuenta como cambiada en todas las filas comunes
+        only_one_side = np.array([(c in cur_table.column_names) != (c in previous.column_names) for c in columns])
+        diff = cur_h[common] != prev_h[pos[common]]
+        diff |= only_one_side
+        changed_cols[common] = diff
+
+    updated = common & changed_cols.any(axis=1)
+    unchanged = common & ~updated
+    inserted = ~common
+
+    # ts_last_update se conserva donde el contenido no ha cambiado
+    for col in exclude:
+        if unchanged.any() and col in current.columns and col in previous.column_names:
+            prev_col = np.asarray(previous.column(col).to_pylist(), dtype=object)
+            current[col] = current[col].astype(object)
+            current.loc[unchanged, col] = prev_col[pos[unchanged]]
+
+    deleted_keys = prev_keys.difference(cur_keys, sort=False)
+
+    touched = inserted | updated
+    changes = current.loc[touched].copy()
+    changes.insert(0, "op", np.where(inserted[touched], OP_INSERT, OP_UPDATE))
+    # Solo se recorren en Python las filas modificadas, para listar sus columnas
+    col_names = np.array(columns, dtype=object)
+    changes.insert(2, "changed_columns", [
+        list(col_names[row]) if is_update else None
+        for row, is_update in zip(changed_cols[touched], updated[touched])
+    ])
+    if len(deleted_keys):
+        deletes = pd.DataFrame({"op": OP_DELETE, key: list(deleted_keys), "changed_columns": None})
+        changes = pd.concat([changes, deletes], ignore_index=True)
+    changes = changes[["op", key, "changed_columns"] + [c for c in changes.columns if c not in ("op", key, "changed_columns")]]
+    changes.insert(3, "captured_at", captured_at)
+
+    summary = {
+        "insertados": int(inserted.sum()),
+        "modificados": int(updated.sum()),
+        "borrados": int(len(deleted_keys)),
+        "sin_cambios": int(unchanged.sum()),
+    }
+    return current, changes.reset_index(drop=True), summary
@@ -46,9 +46,20 @@ def is_valid_isbn13(isbn):
     s = normalize_isbn(isbn)
     if not s or len(s) != 13 or not s.isdigit():
         return False
-    total = sum((int(d) * (1 if i % 2 == 0 else 3)) for i, d in enumerate(s[:-1]))
-    check = (10 - (total % 10)) % 10
-    return check == int(s[-1])
+    return isbn13_check_digit(s[:-1]) == int(s[-1])
+
+def isbn13_check_digit(first12):
+    """
+    Dígito de control de un ISBN-13 a partir de sus 12 primeros dígitos.
+    """
+    total = sum((int(d) * (1 if i % 2 == 0 else 3)) for i, d in enumerate(first12))
+    return (10 - (total % 10)) % 10
+
+def complete_isbn13(first12):
+    """
+    ISBN-13 completo: los 12 dígitos dados más su dígito de control.
+    """
+    return f"{first12}{isbn13_check_digit(first12)}"
 
 def coalesce_isbn(isbn13, isbn10):
     """
@@ -0,0 +1,85 @@
+"""
+Bloque 3: Utilidades de medición y presupuesto de memoria
+Mide el pico de memoria de cada etapa con tracemalloc (numpy y pandas registran ahí sus buffers)
+más la memoria que Arrow retiene al acabar la etapa (su pool no pasa por tracemalloc), y falla
+con un mensaje claro si se supera el presupuesto configurado.
+"""
+import logging
+import tracemalloc
+from contextlib import contextmanager
+
+MB = 1024 * 1024
+
+# Pico de la integración respecto al tamaño en memoria de las entradas (medido ~4.3x con
+# cli.synthetic_sources; los merges outer y las columnas _gb/_gr multiplican el ancho de las tablas).
+INTEGRATION_EXPANSION_FACTOR = 5
+
+
+class MemoryBudgetError(RuntimeError):
+    """Se ha superado (o se superaría) el presupuesto de memoria configurado."""
+
+
+def frame_bytes(*dfs) -> int:
+    """Memoria real (deep) ocupada por uno o varios DataFrames."""
+    return int(sum(df.memory_usage(index=True, deep=True).sum() for df in dfs))
+
+
+def check_estimate(estimated_bytes, budget_mb, what):
+    """Falla antes de empezar si la estimación ya no cabe en el presupuesto."""
+    if budget_mb is None:
+        return
+    if estimated_bytes > budget_mb * MB:
+        raise MemoryBudgetError(
+            f"{what}: se estiman {estimated_bytes / MB:.1f} MB y el presupuesto es {budget_mb} MB. "
+            f"Aumenta --memory-budget-mb o reduce la entrada."
+        )
+
+
+@contextmanager
+def tracing():
+    """Mantiene tracemalloc activo durante todo el bloque para que cada etapa vea la memoria viva de las anteriores."""
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    try:
+        yield
+    finally:
+        if started:
+            tracemalloc.stop()
+
+
+@contextmanager
+def track_stage(name, budget_mb=None, report=None):
+    """
+    Mide el pico de memoria durante el bloque y lo guarda en report[name] (MB): el pico de
+    tracemalloc más lo que el pool de Arrow tiene reservado al terminar (columnas ArrowDtype,
+    tablas). Los picos transitorios de Arrow dentro de la etapa no se ven.
+    Dentro de tracing() el pico incluye lo que siguen ocupando las etapas anteriores.
+    Si hay presupuesto y el pico lo supera, lanza MemoryBudgetError al terminar la etapa,
+    antes de que empiece la siguiente.
+    """
+    import pyarrow as pa
+
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    base, _ = tracemalloc.get_traced_memory()
+    try:
+        yield
+        _, python_peak = tracemalloc.get_traced_memory()
+        arrow = pa.total_allocated_bytes()
+    finally:
+        if started:
+            tracemalloc.stop()
+
+    peak = python_peak + arrow
+    peak_mb = round(peak / MB, 2)
+    if report is not None:
+        report[name] = peak_mb
+    logging.info(f"Memoria etapa '{name}': pico {peak_mb} MB (Python {python_peak / MB:.2f} MB, "
+                 f"Arrow {arrow / MB:.2f} MB, base {base / MB:.2f} MB)")
+    if budget_mb is not None and peak > budget_mb * MB:
+        raise MemoryBudgetError(
+            f"La etapa '{name}' alcanzó un pico de {peak_mb} MB y el presupuesto es {budget_mb} MB."
+        )